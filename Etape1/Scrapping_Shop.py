@@ -1,16 +1,35 @@
+import argparse
+import os
+import queue
+import re
+import threading
 import requests
 import mysql.connector
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# List of Shopify stores
-stores = [
-    "https://www.allbirds.com",
-    "https://www.brooklinen.com",
-    "https://www.untuckit.com",
-    "https://tattly.com",
-    "https://flowrette.com"
-    # Add more stores as needed
-]
+from host_limits import HostConcurrencyLimiter, HostRateLimiter
+from retry_policy import RetryPolicy, parse_retry_after
+from http_cache import ValidatorCache
+from response_archive import ResponseArchive
+from shopify_stream import ProductStreamError, iter_products
+from http_transport import build_http2_session, build_session
+from work_queue import IncompleteJob, WorkQueue, create_jobs_table_if_not_exists, lease_lost, run_worker
+from recrawl_scheduler import run_recrawl_scheduler
+from store_registry import derive_store_name, load_store_registry
+from bulk_load import TsvSpool, load_spool, server_allows_local_infile
+from html_text import html_to_text
+from crawl_metrics import METRICS, export_metrics, record_response, timed_commit
+from product_record import VARIANT_COLUMNS, decode_shopify_product, shopify_product_url
+from record_sink import (DEFAULT_BATCH_SIZE, DEFAULT_PACKET_HEADROOM, RecordSink,
+                         get_max_allowed_packet, iter_row_batches)
+
+# --- Store Registry ---
+# Stores and their per-store crawl settings (concurrency, rate limit, page size, priority) live in
+# stores.json, indexed by host. Loaded once at startup by use_store_registry().
+STORE_REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stores.json')
+STORE_REGISTRY = None
+stores = [] # Store URLs from the registry, highest priority first
 
 # --- Database Configuration ---
 DB_CONFIG = {
@@ -28,10 +47,80 @@ REQUEST_HEADERS = {
     # 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.4758.102 Safari/537.36'
 }
 
+# Shared pooled transport: keep-alive connections per host, gzip/brotli, cached DNS.
+# main() swaps in an HTTP/2 session with --http2.
+HTTP_SESSION = build_session(headers=REQUEST_HEADERS)
+
+# --- Concurrent Crawl Configuration ---
+MAX_CONCURRENT_REQUESTS = 8  # Requests in flight across all stores (also the number of store workers)
+MAX_REQUESTS_PER_HOST = 2    # Default for hosts without a 'max_concurrency' in the store registry
+HOST_LIMITER = HostConcurrencyLimiter(MAX_CONCURRENT_REQUESTS, MAX_REQUESTS_PER_HOST)
+
+# --- Politeness (per-host token buckets) ---
+# Each store host gets a bucket refilled at RATE_LIMIT_PER_SECOND requests/second that can hold
+# RATE_LIMIT_BURST requests. Requests only wait when their host's bucket is empty.
+# Per-store values come from 'rate_per_second' / 'burst' in the store registry.
+RATE_LIMIT_PER_SECOND = 0.66  # Roughly the old fixed 1.5 s pause between pages
+RATE_LIMIT_BURST = 2
+RATE_LIMITER = HostRateLimiter(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+
+# --- Retries (429 / 5xx / network errors) ---
+# Failed pages are retried in place with exponential backoff and jitter, honouring Retry-After
+# in full (up to 15 minutes, in case a server sends a nonsensical value).
+RETRY_POLICY = RetryPolicy(max_retries=5, base_delay=1.0, max_delay=60.0, max_retry_after=900.0)
+
+# --- Conditional HTTP Caching ---
+# ETag / Last-Modified validators of every products.json page are kept on disk. Repeat crawls
+# send If-None-Match / If-Modified-Since and skip parsing and DB writes on 304 Not Modified.
+HTTP_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'http_cache.json')
+HTTP_CACHE = None # Set up in main()
+
+# --- Raw Response Archive / Offline Replay ---
+# With --archive every fetched products.json body is kept (gzip, content-addressed) under ARCHIVE_DIR.
+# With --replay pages are served from that archive instead of the network, through the same parse/upsert code.
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'response_archive')
+RESPONSE_ARCHIVE = None # Set up in main()
+REPLAY_MODE = False
+
+# --- Distributed Work Queue ---
+SHOPIFY_QUEUE_NAME = 'shopify_stores' # One job per store in crawl_jobs
+
+# --- Pipelined Mode (fetch -> parse -> DB writer) ---
+PIPELINE_FETCH_QUEUE_SIZE = 16  # Fetched pages waiting to be parsed
+PIPELINE_WRITE_QUEUE_SIZE = 16  # Parsed pages waiting for the DB writer
+PIPELINE_PARSER_THREADS = 2
+PIPELINE_PREFETCH_PAGES = 2     # How far a store's fetcher may run ahead of the parser
+
+# --- Collection-Sharded Mode (--mode sharded) ---
+# A store's catalog is split by collection (/collections.json) and every
+# /collections/<handle>/products.json is paged by its own worker, so one huge store is fetched over
+# as many connections as its registry max_concurrency allows. Products listed in several collections are written once.
+SKIPPED_COLLECTIONS = ('all',) # 'all' is the whole catalog again
+
+# --- Bulk Loading (--bulk-load) ---
+# Rows are spooled to a local TSV file, loaded into a per-connection staging table with
+# LOAD DATA LOCAL INFILE, then merged into products with one INSERT ... SELECT ... ON DUPLICATE KEY UPDATE.
+# Store crawls spool up to BULK_LOAD_FLUSH_ROWS rows (many pages) per load; the pipeline writer loads page by page.
+# The server needs local_infile=ON.
+BULK_LOAD = False # Set by main()
+BULK_LOAD_FLUSH_ROWS = 10000
+BULK_LOAD_SPOOL_DIR = None # None: the system temp directory
+
+# --- Metrics (--metrics-file / --metrics-port) ---
+# Fetch latency, bytes and status codes, parse time, rows upserted and commit latency per store
+# (see crawl_metrics.py), exported as Prometheus text or JSON to a file and/or GET /metrics on a local port.
+
+# --- Removed Products ---
+# Every crawl records the product URLs it sees per store; once a store has been walked from page 1
+# to the end of its catalog, products it no longer lists get removed_at set (or are deleted with --purge-removed).
+PURGE_REMOVED_PRODUCTS = False # Set by main()
+# After that sweep, descriptions no product references any more are deleted too, once older than this
+ORPHAN_DESCRIPTION_GRACE_HOURS = 24
+
 def db_connect():
     """Establishes a connection to the MySQL database."""
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
+        conn = mysql.connector.connect(**DB_CONFIG, allow_local_infile=BULK_LOAD)
         print("Successfully connected to MySQL database.")
         return conn
     except mysql.connector.Error as err:
@@ -49,137 +138,1284 @@ def create_table_if_not_exists(cursor):
                 vendor VARCHAR(255),
                 price DECIMAL(10, 2),
                 availability VARCHAR(50),
-                description TEXT,
+                description_hash CHAR(40), -- SHA-1 of body_html, key into product_descriptions
                 category VARCHAR(255),
                 store_name VARCHAR(100),
-                scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+                min_price DECIMAL(10, 2), -- Aggregates over product_variants, kept with the product
+                max_price DECIMAL(10, 2),
+                variant_count INT,
+                available_variant_count INT,
+                shopify_updated_at VARCHAR(40), -- Raw 'updated_at' from products.json
+                content_hash CHAR(40), -- SHA-1 of the stored fields, used by incremental crawls
+                removed_at DATETIME NULL, -- Set when a full crawl no longer finds the product in the store
+                scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                INDEX idx_products_store_name (store_name),
+                INDEX idx_products_description_hash (description_hash)
             );
         """)
+        # Bring tables created by older versions of this script up to date
+        apply_schema_change(cursor, "ALTER TABLE products ADD COLUMN shopify_updated_at VARCHAR(40) AFTER store_name;")
+        apply_schema_change(cursor, "ALTER TABLE products ADD COLUMN content_hash CHAR(40) AFTER shopify_updated_at;")
+        apply_schema_change(cursor, "ALTER TABLE products ADD INDEX idx_products_store_name (store_name);")
+        apply_schema_change(cursor, "ALTER TABLE products ADD COLUMN removed_at DATETIME NULL AFTER content_hash;")
+        apply_schema_change(cursor, "ALTER TABLE products ADD COLUMN description_hash CHAR(40) AFTER availability;")
+        apply_schema_change(cursor, "ALTER TABLE products ADD INDEX idx_products_description_hash (description_hash);")
+        apply_schema_change(cursor, "ALTER TABLE products ADD COLUMN min_price DECIMAL(10, 2) AFTER store_name;")
+        apply_schema_change(cursor, "ALTER TABLE products ADD COLUMN max_price DECIMAL(10, 2) AFTER min_price;")
+        apply_schema_change(cursor, "ALTER TABLE products ADD COLUMN variant_count INT AFTER max_price;")
+        apply_schema_change(cursor, "ALTER TABLE products ADD COLUMN available_variant_count INT AFTER variant_count;")
         print("Table 'products' checked/created successfully.")
     except mysql.connector.Error as err:
         print(f"Error creating table: {err}")
 
+def create_variants_table_if_not_exists(cursor):
+    """Creates the product_variants table (every variant of every product) if it doesn't already exist."""
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS product_variants (
+                variant_id BIGINT PRIMARY KEY, -- Shopify variant id
+                product_url VARCHAR(1024) NOT NULL,
+                store_name VARCHAR(100),
+                title VARCHAR(255),
+                sku VARCHAR(255),
+                price DECIMAL(10, 2),
+                compare_at_price DECIMAL(10, 2),
+                available TINYINT,
+                option1 VARCHAR(255),
+                option2 VARCHAR(255),
+                option3 VARCHAR(255),
+                scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                INDEX idx_variants_product_url (product_url(255)),
+                INDEX idx_variants_store_name (store_name)
+            );
+        """)
+        print("Table 'product_variants' checked/created successfully.")
+    except mysql.connector.Error as err:
+        print(f"Error creating product_variants table: {err}")
 
-# --- Main Script Logic ---
-def main():
-    db_connection = db_connect()
-    if not db_connection:
-        print("Could not connect to database. Exiting.")
+def create_descriptions_table_if_not_exists(cursor):
+    """Creates the product_descriptions table: each distinct body_html once, compressed, keyed by its SHA-1."""
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS product_descriptions (
+                description_hash CHAR(40) PRIMARY KEY,
+                body MEDIUMBLOB NOT NULL, -- COMPRESS()ed body_html; read with UNCOMPRESS()
+                description_text MEDIUMTEXT, -- Plain text of body_html, extracted once at ingest
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        apply_schema_change(cursor, "ALTER TABLE product_descriptions ADD COLUMN description_text MEDIUMTEXT AFTER body;")
+        print("Table 'product_descriptions' checked/created successfully.")
+    except mysql.connector.Error as err:
+        print(f"Error creating product_descriptions table: {err}")
+
+def migrate_inline_descriptions(cursor):
+    """Moves descriptions stored inline by older versions (products.description) into
+    product_descriptions, then drops the column. A no-op once done."""
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'products' AND COLUMN_NAME = 'description';
+    """)
+    if not cursor.fetchone()[0]:
         return
+    print("Moving inline product descriptions to product_descriptions...")
+    try:
+        cursor.execute("""
+            INSERT IGNORE INTO product_descriptions (description_hash, body)
+            SELECT SHA1(description), COMPRESS(description) FROM products
+            WHERE description IS NOT NULL AND description <> '';
+        """)
+        cursor.execute("""
+            UPDATE products SET description_hash = IF(description IS NULL OR description = '', NULL, SHA1(description));
+        """)
+        cursor.execute("ALTER TABLE products DROP COLUMN description;") # Implicitly commits the two statements above
+        print("Inline descriptions moved; products.description dropped.")
+    except mysql.connector.Error as err:
+        print(f"Error moving inline descriptions: {err}")
+
+def create_checkpoint_table_if_not_exists(cursor):
+    """Creates the crawl_checkpoints table used by --resume if it doesn't already exist."""
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_checkpoints (
+                store_url VARCHAR(255) PRIMARY KEY,
+                last_page INT NOT NULL DEFAULT 0, -- Highest page whose rows are committed (all earlier pages too)
+                completed TINYINT NOT NULL DEFAULT 0, -- 1 once the end of the catalog was reached
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            );
+        """)
+        print("Table 'crawl_checkpoints' checked/created successfully.")
+    except mysql.connector.Error as err:
+        print(f"Error creating crawl_checkpoints table: {err}")
+
+def create_page_products_table_if_not_exists(cursor):
+    """Creates the crawl_page_products table (product URLs last seen on each products.json page), which
+    lets a 304 Not Modified page still account for its products in the removed-products sweep."""
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_page_products (
+                page_url VARCHAR(1024) NOT NULL,
+                store_name VARCHAR(100) NOT NULL,
+                page INT NOT NULL DEFAULT 0,
+                product_url VARCHAR(1024) NOT NULL,
+                INDEX idx_page_url (page_url(255)),
+                INDEX idx_store_page (store_name, page)
+            );
+        """)
+        apply_schema_change(cursor, "ALTER TABLE crawl_page_products ADD COLUMN page INT NOT NULL DEFAULT 0 AFTER store_name;")
+        apply_schema_change(cursor, "ALTER TABLE crawl_page_products ADD INDEX idx_store_page (store_name, page);")
+        print("Table 'crawl_page_products' checked/created successfully.")
+    except mysql.connector.Error as err:
+        print(f"Error creating crawl_page_products table: {err}")
+
+def apply_schema_change(cursor, ddl):
+    """Runs an ALTER TABLE, ignoring 'already exists' errors so it is safe to repeat."""
+    try:
+        cursor.execute(ddl)
+    except mysql.connector.Error as err:
+        if err.errno in (1060, 1061): # Duplicate column name / duplicate key name
+            pass # Already applied, which is fine
+        else:
+            raise
+
+
+# --- Batched Upserts ---
+UPSERT_BATCH_SIZE = DEFAULT_BATCH_SIZE        # Max rows per multi-row INSERT (a full products.json page)
+MAX_PACKET_HEADROOM = DEFAULT_PACKET_HEADROOM # Fraction of max_allowed_packet a single statement may use
+
+PRODUCT_COLUMNS = ('product_url', 'title', 'vendor', 'price', 'availability', 'description_hash', 'category', 'store_name',
+                   'min_price', 'max_price', 'variant_count', 'available_variant_count', 'shopify_updated_at', 'content_hash')
+PRODUCT_UPDATE_CLAUSE = """
+ON DUPLICATE KEY UPDATE
+    title = VALUES(title),
+    vendor = VALUES(vendor),
+    price = VALUES(price),
+    availability = VALUES(availability),
+    description_hash = VALUES(description_hash),
+    category = VALUES(category),
+    store_name = VALUES(store_name),
+    min_price = VALUES(min_price),
+    max_price = VALUES(max_price),
+    variant_count = VALUES(variant_count),
+    available_variant_count = VALUES(available_variant_count),
+    shopify_updated_at = VALUES(shopify_updated_at),
+    content_hash = VALUES(content_hash),
+    removed_at = NULL,
+    scraped_at = CURRENT_TIMESTAMP;
+"""
+
+VARIANT_UPDATE_CLAUSE = """
+ON DUPLICATE KEY UPDATE
+    product_url = VALUES(product_url),
+    store_name = VALUES(store_name),
+    title = VALUES(title),
+    sku = VALUES(sku),
+    price = VALUES(price),
+    compare_at_price = VALUES(compare_at_price),
+    available = VALUES(available),
+    option1 = VALUES(option1),
+    option2 = VALUES(option2),
+    option3 = VALUES(option3);
+"""
+
+DESCRIPTION_INSERT_SQL = """
+INSERT IGNORE INTO product_descriptions (description_hash, body, description_text)
+VALUES (%s, COMPRESS(%s), %s);
+"""
+
+def product_row(record):
+    """The products row of a ProductRecord, in PRODUCT_COLUMNS order."""
+    return ((record.product_url, record.title, record.vendor, record.price, record.availability,
+             record.description_hash, record.category, record.store_name)
+            + record.variant_aggregates() + (record.updated_at, record.content_hash))
+
+def upsert_products(cursor, records, max_allowed_packet, batch_size=UPSERT_BATCH_SIZE):
+    """Writes ProductRecords to products with as few multi-row upserts as max_allowed_packet allows.
+    Returns the number of rows written."""
+    sink = RecordSink(cursor, 'products', PRODUCT_COLUMNS, PRODUCT_UPDATE_CLAUSE, product_row,
+                      max_allowed_packet, batch_size, MAX_PACKET_HEADROOM)
+    return sink.write(records)
+
+def upsert_variants(cursor, records, max_allowed_packet, batch_size=UPSERT_BATCH_SIZE):
+    """Writes every variant of `records` and deletes variants those products no longer have.
+    Returns (variants written, complete); a rejected batch is retried row by row, like products,
+    and complete is False if any variant was skipped or the stale variants couldn't be deleted."""
+    product_urls = [record.product_url for record in records]
+    variant_rows = [variant for record in records for variant in record.variants]
+    sink = RecordSink(cursor, 'product_variants', VARIANT_COLUMNS, VARIANT_UPDATE_CLAUSE, lambda variant: variant,
+                      max_allowed_packet, batch_size, MAX_PACKET_HEADROOM)
+    written = sink.write(variant_rows)
+    complete = written == len(variant_rows)
+    if product_urls:
+        url_placeholders = ", ".join(["%s"] * len(product_urls))
+        sql = f"DELETE FROM product_variants WHERE product_url IN ({url_placeholders})"
+        if variant_rows:
+            sql += f" AND variant_id NOT IN ({', '.join(['%s'] * len(variant_rows))})"
+        try:
+            cursor.execute(sql + ";", tuple(product_urls) + tuple(variant[0] for variant in variant_rows))
+        except mysql.connector.Error as err:
+            print(f"Could not delete stale variants of {len(product_urls)} products ({err}). They are kept until the next crawl.")
+            complete = False
+    return written, complete
+
+def store_descriptions(cursor, records, max_allowed_packet):
+    """Writes the descriptions of `records` that product_descriptions doesn't hold yet.
+    Returns (new descriptions written, complete); complete is False if any of them was skipped."""
+    descriptions = {record.description_hash: str(record.description) for record in records if record.description_hash}
+    if not descriptions:
+        return 0, True
+    placeholders = ", ".join(["%s"] * len(descriptions))
+    try:
+        cursor.execute(f"SELECT description_hash FROM product_descriptions WHERE description_hash IN ({placeholders});",
+                       tuple(descriptions))
+        missing = descriptions.keys() - {digest for (digest,) in cursor.fetchall()}
+    except mysql.connector.Error as err:
+        print(f"Could not look up stored descriptions ({err}). Writing all {len(descriptions)} (duplicates are ignored).")
+        missing = descriptions.keys()
+    max_bytes = int(max_allowed_packet * MAX_PACKET_HEADROOM)
+    # Text is extracted here, once per distinct description, so analysis never has to strip HTML
+    values = [(digest, descriptions[digest], html_to_text(descriptions[digest])) for digest in missing]
+    written = 0
+    for batch in iter_row_batches(values, UPSERT_BATCH_SIZE, max_bytes):
+        try:
+            cursor.executemany(DESCRIPTION_INSERT_SQL, batch)
+            written += len(batch)
+        except mysql.connector.Error as err:
+            print(f"Batch insert of {len(batch)} descriptions failed ({err}). Retrying row by row.")
+            for row in batch:
+                try:
+                    cursor.execute(DESCRIPTION_INSERT_SQL, row)
+                    written += 1
+                except mysql.connector.Error as row_err:
+                    print(f"Skipping description {row[0]} due to DB error: {row_err}")
+    return written, written == len(values)
+
+def write_product_records(cursor, records, max_allowed_packet, spool=None):
+    """Writes a page of ProductRecords: their descriptions, then products and variants, or
+    appends them to `spool` (a ProductSpool) for the next bulk load.
+
+    Returns (rows written, complete). complete is False if any row was skipped by the row-by-row
+    fallback; the page's validators must then not be cached, or a 304 would hide it until it changes.
+    """
+    _, complete = store_descriptions(cursor, records, max_allowed_packet)
+    if spool is not None:
+        spool.write_records(records)
+        return 0, complete
+    written = upsert_products(cursor, records, max_allowed_packet)
+    variants_written, variants_complete = upsert_variants(cursor, records, max_allowed_packet)
+    if records:
+        METRICS.inc('crawl_rows_upserted_total', written, store=records[0].store_name, table='products')
+        METRICS.inc('crawl_rows_upserted_total', variants_written, store=records[0].store_name, table='product_variants')
+    return written, complete and variants_complete and written == len(records)
+
+def backfill_description_text(cursor, batch_size=UPSERT_BATCH_SIZE):
+    """Extracts description_text for descriptions stored before it existed. A no-op once done."""
+    filled = 0
+    while True:
+        cursor.execute("""
+            SELECT description_hash, CONVERT(UNCOMPRESS(body) USING utf8mb4) FROM product_descriptions
+            WHERE description_text IS NULL LIMIT %s;
+        """, (batch_size,))
+        batch = cursor.fetchall()
+        if not batch:
+            break
+        cursor.executemany("UPDATE product_descriptions SET description_text = %s WHERE description_hash = %s;",
+                           [(html_to_text(body), digest) for digest, body in batch])
+        filled += len(batch)
+    if filled:
+        print(f"Extracted text for {filled} previously stored descriptions.")
+
+class ProductSpool:
+    """TSV spools for product rows and their variant rows, bulk-loaded together."""
+
+    def __init__(self, prefix):
+        prefix = re.sub(r'[^A-Za-z0-9_.-]', '_', prefix) # Store names derived from URLs may contain '/' or ':'
+        self.products = TsvSpool(BULK_LOAD_SPOOL_DIR, prefix=f"{prefix}-products-")
+        self.variants = TsvSpool(BULK_LOAD_SPOOL_DIR, prefix=f"{prefix}-variants-")
+
+    @property
+    def row_count(self):
+        return self.products.row_count
+
+    def write_records(self, records):
+        self.products.write_rows(product_row(record) for record in records)
+        self.variants.write_rows(variant for record in records for variant in record.variants)
+
+    def truncate(self):
+        self.products.truncate()
+        self.variants.truncate()
+
+    def close(self):
+        self.products.close()
+        self.variants.close()
+
+def create_staging_table(cursor, staging_table, table, columns):
+    """Creates this connection's (empty) staging table with `table`'s column types and no indexes."""
+    cursor.execute(f"""
+        CREATE TEMPORARY TABLE IF NOT EXISTS {staging_table} AS
+        SELECT {', '.join(columns)} FROM {table} LIMIT 0;
+    """)
+    cursor.execute(f"DELETE FROM {staging_table};") # Not TRUNCATE, which would commit the caller's transaction
+
+BULK_MERGE_PRODUCTS_SQL = (f"INSERT INTO products ({', '.join(PRODUCT_COLUMNS)}) "
+                           f"SELECT {', '.join(PRODUCT_COLUMNS)} FROM products_staging"
+                           + PRODUCT_UPDATE_CLAUSE)
+BULK_MERGE_VARIANTS_SQL = (f"INSERT INTO product_variants ({', '.join(VARIANT_COLUMNS)}) "
+                           f"SELECT {', '.join(VARIANT_COLUMNS)} FROM variants_staging"
+                           + VARIANT_UPDATE_CLAUSE)
+# Variants of the loaded products that are not in the load anymore
+BULK_DELETE_STALE_VARIANTS_SQL = """
+    DELETE pv FROM product_variants pv
+    JOIN products_staging ps ON ps.product_url = pv.product_url
+    LEFT JOIN variants_staging vs ON vs.variant_id = pv.variant_id
+    WHERE vs.variant_id IS NULL;
+"""
+
+def bulk_upsert_products(cursor, spool, store_name=''):
+    """Writes the rows spooled in `spool` (a ProductSpool) with LOAD DATA into staging tables and
+    set-based upserts into products and product_variants. The spool is emptied either way.
+    Returns the number of product rows written."""
+    try:
+        if not spool.row_count:
+            return 0
+        create_staging_table(cursor, 'products_staging', 'products', PRODUCT_COLUMNS)
+        create_staging_table(cursor, 'variants_staging', 'product_variants', VARIANT_COLUMNS)
+        loaded = load_spool(cursor, spool.products, 'products_staging', PRODUCT_COLUMNS)
+        variants_loaded = load_spool(cursor, spool.variants, 'variants_staging', VARIANT_COLUMNS)
+        cursor.execute(BULK_MERGE_PRODUCTS_SQL)
+        cursor.execute(BULK_MERGE_VARIANTS_SQL)
+        cursor.execute(BULK_DELETE_STALE_VARIANTS_SQL)
+        METRICS.inc('crawl_rows_upserted_total', loaded, store=store_name, table='products')
+        METRICS.inc('crawl_rows_upserted_total', variants_loaded, store=store_name, table='product_variants')
+        return loaded
+    finally:
+        spool.truncate()
+
+# --- Removed Products ---
+def start_seen_products(cursor, store_name):
+    """Creates this connection's seen-products table if needed and clears the store's entries."""
+    cursor.execute("""
+        CREATE TEMPORARY TABLE IF NOT EXISTS crawl_seen_products (
+            store_name VARCHAR(100) NOT NULL,
+            product_url VARCHAR(1024) NOT NULL,
+            INDEX idx_seen_store_url (store_name, product_url(255))
+        );
+    """)
+    cursor.execute("DELETE FROM crawl_seen_products WHERE store_name = %s;", (store_name,))
+
+def record_seen_products(cursor, store_name, product_urls):
+    """Remembers that these products are still listed by the store (one multi-row INSERT)."""
+    if product_urls:
+        cursor.executemany("INSERT INTO crawl_seen_products (store_name, product_url) VALUES (%s, %s);",
+                           [(store_name, url) for url in product_urls])
+
+def record_page_products(cursor, store_name, page_url, page, product_urls, headers):
+    """Records a fetched page's product URLs as seen, and as the page's contents for later 304s.
+
+    The contents are only kept when a 304 is possible: the HTTP cache is on and the response carries
+    validators. Otherwise (--no-http-cache, --replay, no ETag / Last-Modified) they would be pure write churn.
+    """
+    record_seen_products(cursor, store_name, product_urls)
+    if not HTTP_CACHE or not (headers.get('ETag') or headers.get('Last-Modified')):
+        return
+    cursor.execute("DELETE FROM crawl_page_products WHERE page_url = %s;", (page_url,))
+    if product_urls:
+        cursor.executemany("""
+            INSERT INTO crawl_page_products (page_url, store_name, page, product_url) VALUES (%s, %s, %s, %s);
+        """, [(page_url, store_name, page, url) for url in product_urls])
+
+def forget_pages_beyond(cursor, store_name, last_page):
+    """Deletes the recorded contents of pages past the end of a catalog that has shrunk."""
+    cursor.execute("DELETE FROM crawl_page_products WHERE store_name = %s AND page > %s;", (store_name, last_page))
+
+def record_cached_page_products(cursor, store_name, page_url):
+    """Marks the products recorded for a 304 Not Modified page as seen (set-based).
+    Returns how many there were; 0 means the page's products can't be accounted for."""
+    cursor.execute("""
+        INSERT INTO crawl_seen_products (store_name, product_url)
+        SELECT store_name, product_url FROM crawl_page_products WHERE page_url = %s;
+    """, (page_url,))
+    return cursor.rowcount
+
+def sweep_removed_products(cursor, store_name, purge=False):
+    """Anti-joins the store's products against the URLs seen by a complete crawl.
+
+    Products that were not seen are marked removed (or deleted with `purge`); removed products
+    that showed up again are un-marked. Returns the number of products marked or deleted.
+    """
+    join = """
+        products p LEFT JOIN crawl_seen_products s
+            ON s.store_name = p.store_name AND s.product_url = p.product_url
+    """
+    if purge:
+        cursor.execute(f"DELETE p FROM {join} WHERE p.store_name = %s AND s.product_url IS NULL;", (store_name,))
+        removed = cursor.rowcount
+        cursor.execute("""
+            DELETE pv FROM product_variants pv LEFT JOIN products p ON p.product_url = pv.product_url
+            WHERE pv.store_name = %s AND p.id IS NULL;
+        """, (store_name,))
+    else:
+        cursor.execute(f"""
+            UPDATE {join} SET p.removed_at = NOW()
+            WHERE p.store_name = %s AND p.removed_at IS NULL AND s.product_url IS NULL;
+        """, (store_name,))
+        removed = cursor.rowcount
+    cursor.execute("""
+        UPDATE products p JOIN crawl_seen_products s
+            ON s.store_name = p.store_name AND s.product_url = p.product_url
+        SET p.removed_at = NULL
+        WHERE p.store_name = %s AND p.removed_at IS NOT NULL;
+    """, (store_name,)) # Unchanged products skipped by incremental crawls are never re-upserted
+    cursor.execute("DELETE FROM crawl_seen_products WHERE store_name = %s;", (store_name,))
+    if removed:
+        print(f"{removed} products no longer listed by {store_name} were {'deleted' if purge else 'marked as removed'}.")
+    delete_orphan_descriptions(cursor)
+    return removed
+
+def delete_orphan_descriptions(cursor, grace_hours=ORPHAN_DESCRIPTION_GRACE_HOURS):
+    """Deletes descriptions no product references any more (changed body_html, purged products,
+    hashes left by the inline-description migration), with one set-based anti-join.
+
+    Descriptions younger than `grace_hours` are kept: another store's crawl may be about to commit
+    the products pointing at them. Returns the number deleted.
+    """
+    cursor.execute("""
+        DELETE d FROM product_descriptions d
+            LEFT JOIN products p ON p.description_hash = d.description_hash
+        WHERE p.id IS NULL AND d.created_at < NOW() - INTERVAL %s HOUR;
+    """, (grace_hours,))
+    deleted = cursor.rowcount
+    if deleted:
+        print(f"Deleted {deleted} descriptions no product references any more.")
+    return deleted
+
+# --- Checkpoints ---
+def save_checkpoint(cursor, base_url, last_page, completed=False):
+    """Records crawl progress for a store. Runs inside the caller's transaction, so a checkpoint
+    is committed together with the rows of the page it points to."""
+    cursor.execute("""
+        INSERT INTO crawl_checkpoints (store_url, last_page, completed) VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE last_page = VALUES(last_page), completed = VALUES(completed);
+    """, (base_url, last_page, int(completed)))
+
+def load_checkpoints(cursor):
+    """Returns {store_url: (last_page, completed)} for every checkpointed store."""
+    cursor.execute("SELECT store_url, last_page, completed FROM crawl_checkpoints;")
+    return {url: (last_page, bool(completed)) for url, last_page, completed in cursor.fetchall()}
 
+def reset_checkpoints(cursor, store_urls):
+    """Forgets previous progress for these stores (a fresh, non-resumed crawl)."""
+    if store_urls:
+        placeholders = ", ".join(["%s"] * len(store_urls))
+        cursor.execute(f"DELETE FROM crawl_checkpoints WHERE store_url IN ({placeholders});", tuple(store_urls))
+
+def plan_resume(cursor, store_urls):
+    """Works out which stores still need crawling and the page each one should start from."""
+    checkpoints = load_checkpoints(cursor)
+    start_pages = {}
+    for base_url in store_urls:
+        last_page, completed = checkpoints.get(base_url, (0, False))
+        if completed:
+            print(f"Resume: {base_url} already completed. Skipping.")
+            continue
+        start_pages[base_url] = last_page + 1
+        if last_page:
+            print(f"Resume: {base_url} continues at page {last_page + 1}.")
+    return start_pages
+
+def use_store_registry(path):
+    """Loads the store registry and applies its per-host concurrency and rate limits."""
+    global STORE_REGISTRY, stores
+    STORE_REGISTRY = load_store_registry(path)
+    stores = STORE_REGISTRY.urls
+    STORE_REGISTRY.apply_host_limits(HOST_LIMITER, RATE_LIMITER)
+    return STORE_REGISTRY
+
+def get_store_name(base_url):
+    """Store name from the registry, or derived from the URL for unregistered stores."""
+    config = STORE_REGISTRY.get(base_url) if STORE_REGISTRY else None
+    return config.name if config else derive_store_name(base_url)
+
+def products_page_url(base_url, page, collection=None):
+    """URL of one products.json page (of the whole store, or of one collection), using the store's
+    configured page size (250 = fewest requests)."""
+    config = STORE_REGISTRY.get(base_url) if STORE_REGISTRY else None
+    page_size = config.page_size if config else 250
+    path = f"/collections/{collection}/products.json" if collection else "/products.json"
+    return f"{base_url}{path}?page={page}&limit={page_size}"
+
+def fetch_products_page(url, store_name, page, extra_headers=None):
+    """Fetches one /products.json page, retrying the same page on 429/5xx and network errors.
+
+    Returns the response (which may be a 304 when `extra_headers` carries validators),
+    or None if this store should stop.
+    """
+    if REPLAY_MODE:
+        response = RESPONSE_ARCHIVE.response_for(url)
+        if response is None:
+            print(f"{url} is not in the response archive. Stopping replay of {store_name}.")
+        return response
+
+    attempt = 0
+    while True:
+        response = None
+        started = time.perf_counter()
+        try:
+            RATE_LIMITER.acquire(url) # Wait for a token before taking a request slot
+            with HOST_LIMITER.slot(url):
+                started = time.perf_counter()
+                response = HTTP_SESSION.get(url, headers=extra_headers, timeout=30) # Increased timeout
+            record_response(response, time.perf_counter() - started, store=store_name)
+            response.raise_for_status()  # Raises HTTPError for bad responses (4XX or 5XX)
+            if RESPONSE_ARCHIVE and response.status_code == 200:
+                RESPONSE_ARCHIVE.put(url, response.content, response.headers.get('Content-Type'))
+            return response
+        except requests.exceptions.HTTPError as http_err:
+            status_code = http_err.response.status_code
+            if RETRY_POLICY.should_retry(status_code, attempt):
+                retry_after = parse_retry_after(http_err.response.headers.get('Retry-After'))
+                delay = RETRY_POLICY.delay(attempt, retry_after)
+                attempt += 1
+                if status_code == 429: # Too Many Requests
+                    print(f"Rate limited (429) at {url}. Retrying page {page} in {delay:.1f}s (retry {attempt}/{RETRY_POLICY.max_retries}).")
+                    RATE_LIMITER.defer(url, delay) # Hold back every worker on this host, not just this one
+                else:
+                    print(f"Server error ({status_code}) at {url}. Retrying page {page} in {delay:.1f}s (retry {attempt}/{RETRY_POLICY.max_retries}).")
+                time.sleep(delay)
+                continue
+            if status_code == 404:
+                print(f"Page {page} not found for {store_name} (404), likely end of products for this store.")
+            elif status_code == 401 or status_code == 403:
+                print(f"Access Denied (401/403) for {url}. Store might be private or block scraping.")
+            elif status_code in RETRY_POLICY.retry_statuses:
+                print(f"Giving up on {url} after {attempt} retries (last status {status_code}).")
+            else:
+                print(f"HTTP error fetching {url}: {http_err}")
+        except requests.exceptions.RequestException as req_err: # Other errors (timeout, connection)
+            if response is None:
+                record_response(None, time.perf_counter() - started, store=store_name)
+            if RETRY_POLICY.should_retry(None, attempt):
+                delay = RETRY_POLICY.delay(attempt)
+                attempt += 1
+                print(f"Request error fetching {url}: {req_err}. Retrying page {page} in {delay:.1f}s (retry {attempt}/{RETRY_POLICY.max_retries}).")
+                time.sleep(delay)
+                continue
+            print(f"Request error fetching {url}: {req_err}")
+        return None
+
+def load_known_products(cursor, store_name):
+    """Returns {product_url: content_hash} for a store, in one query.
+
+    Rows stored before variants were ingested are left out, so they are rewritten once."""
+    cursor.execute("""
+        SELECT product_url, content_hash FROM products
+        WHERE store_name = %s AND variant_count IS NOT NULL;
+    """, (store_name,))
+    return {url: digest for url, digest in cursor.fetchall()}
+
+def filter_changed_records(records, known_products):
+    """Drops records whose product is already stored with the same content hash.
+
+    updated_at alone is not trusted: Shopify doesn't bump it for every change (e.g. some inventory updates),
+    and the hash covers every stored field, variants included."""
+    return [record for record in records if known_products.get(record.product_url) != record.content_hash]
+
+def parse_products_page(products_on_page, base_url, store_name):
+    """Decodes a page of products into ProductRecords, skipping (and reporting) products that fail.
+
+    `products_on_page` can be any iterable (e.g. iter_products()). Returns (records, product_urls, product_count),
+    where `product_urls` lists every product on the page, skipped ones included (they are still listed by the store).
+    """
+    records = []
+    product_urls = []
+    product_count = 0
+    with METRICS.timer('crawl_parse_seconds', store=store_name):
+        for product in products_on_page:
+            product_count += 1
+            title = product.get('title', 'Unknown Title')
+            product_urls.append(shopify_product_url(base_url, product.get('handle')))
+            try:
+                records.append(decode_shopify_product(product, base_url, store_name))
+            except KeyError as ke:
+                print(f"Skipping product (KeyError: {ke}) in '{title}'. Data: {str(product)[:100]}...")
+            except ValueError as ve:
+                print(f"Skipping product (ValueError: {ve}) in '{title}', likely price conversion.")
+            except Exception as e:
+                print(f"Skipping product '{title}' due to an unexpected error: {e}")
+    return records, product_urls, product_count
+
+def scrape_store(db_connection, base_url, incremental=False, start_page=1):
+    """Scrapes every /products.json page of one store into the products table. Returns the product count.
+    See scrape_store_catalog() for callers that need to know whether the crawl got to the end."""
+    return scrape_store_catalog(db_connection, base_url, incremental, start_page)[0]
+
+def scrape_store_catalog(db_connection, base_url, incremental=False, start_page=1):
+    """Scrapes every /products.json page of one store into the products table.
+    Returns (product count, reached_end): reached_end is False when the crawl stopped early
+    (HTTP errors once retries ran out, bad JSON, a failed bulk load, a lost lease).
+
+    With `incremental`, products whose content hash is unchanged are not written.
+    Progress is checkpointed after every page; `start_page` lets a resumed crawl skip committed pages.
+    With BULK_LOAD, pages are spooled and written (and checkpointed) every BULK_LOAD_FLUSH_ROWS rows.
+    A crawl that walks the whole catalog from page 1 also sweeps products the store no longer lists.
+    """
+    store_name = get_store_name(base_url)
+
+    print(f"\nScraping store: {store_name} from {base_url}" + (f" (resuming at page {start_page})" if start_page > 1 else ""))
     cursor = db_connection.cursor()
-    create_table_if_not_exists(cursor) # Ensure table exists
+    max_allowed_packet = get_max_allowed_packet(cursor)
+    known_products = load_known_products(cursor, store_name) if incremental else None
+    page = start_page
+    products_this_store_count = 0
+    spool = ProductSpool(store_name) if BULK_LOAD else None
+    spooled_pages = [] # (page, url, response headers, product_count) spooled but not written yet
+    reached_end = False
+    start_seen_products(cursor, store_name)
+    seen_all_pages = start_page == 1 # Products on skipped (resumed) pages were not seen by this crawl
+    seen_product_count = 0 # An empty answer must never sweep the whole store
+
+    def flush_spool():
+        """Bulk-loads the spooled pages, checkpoints the last one and commits. Returns False on failure."""
+        nonlocal products_this_store_count
+        if not spooled_pages:
+            return True
+        try:
+            products_this_store_count += bulk_upsert_products(cursor, spool, store_name)
+            save_checkpoint(cursor, base_url, spooled_pages[-1][0])
+            timed_commit(db_connection, store=store_name)
+        except mysql.connector.Error as err:
+            print(f"Bulk load for {store_name} failed: {err}. Stopping this store (resume will retry these pages).")
+            db_connection.rollback()
+            spooled_pages.clear() # Never checkpoint or cache pages whose rows were not written
+            return False
+        for spooled_page, spooled_url, headers, product_count in spooled_pages:
+            if HTTP_CACHE and spooled_url:
+                HTTP_CACHE.store_headers(spooled_url, headers, product_count=product_count)
+        print(f"Pages {spooled_pages[0][0]}-{spooled_pages[-1][0]} for {store_name} bulk-loaded. Total for this store so far: {products_this_store_count}")
+        spooled_pages.clear()
+        return True
+
+    while True:
+        if lease_lost():
+            print(f"Lost the crawl_jobs lease on {store_name}; stopping at page {page}.")
+            break # Another worker resumes the store from its checkpoint
+        url = products_page_url(base_url, page)
+        print(f"Fetching: {url}")
+
+        conditional_headers = HTTP_CACHE.conditional_headers(url) if HTTP_CACHE else None
+        response = fetch_products_page(url, store_name, page, conditional_headers)
+        if response is None:
+            break # Stop processing this store on HTTP errors
+
+        if response.status_code == 304:
+            cached = HTTP_CACHE.get(url) or {}
+            print(f"Page {page} for {store_name} not modified since last crawl ({cached.get('product_count', '?')} products). Skipping.")
+            cached_count = record_cached_page_products(cursor, store_name, url)
+            if not cached_count:
+                seen_all_pages = False # Cached by an older crawl; its products can't be accounted for
+            seen_product_count += cached_count
+            if spooled_pages:
+                spooled_pages.append((page, None, None, None)) # Checkpointed with the spooled pages before it
+            else:
+                save_checkpoint(cursor, base_url, page)
+                timed_commit(db_connection, store=store_name)
+            page += 1
+            continue
+
+        try:
+            # Products are decoded one at a time with only the fields we store
+            # Ensure product_url column has a UNIQUE constraint in your DB for this to work
+            records, product_urls, product_count = parse_products_page(iter_products(response.content), base_url, store_name)
+        except ProductStreamError:
+            print(f"Failed to decode JSON from {url}. Content snippet: {response.text[:200]}")
+            break # Stop processing this store
+
+        if not product_count:
+            if HTTP_CACHE:
+                HTTP_CACHE.forget(url) # Always re-check the end of the catalog
+            if page == 1:
+                print(f"No products found on the first page for {store_name}. The /products.json endpoint might be disabled or empty.")
+            else:
+                print(f"No more products found on page {page} for {store_name}.")
+            if not flush_spool():
+                break
+            if seen_all_pages and seen_product_count:
+                sweep_removed_products(cursor, store_name, PURGE_REMOVED_PRODUCTS)
+            forget_pages_beyond(cursor, store_name, page - 1)
+            save_checkpoint(cursor, base_url, page - 1, completed=True)
+            timed_commit(db_connection, store=store_name)
+            reached_end = True
+            break # End of products for this store
+
+        record_page_products(cursor, store_name, url, page, product_urls, response.headers)
+        seen_product_count += len(product_urls)
+        if known_products is not None:
+            parsed_count = len(records)
+            records = filter_changed_records(records, known_products)
+            print(f"Page {page} for {store_name}: {len(records)} of {parsed_count} products changed since last crawl.")
+        written, page_complete = write_product_records(cursor, records, max_allowed_packet, spool)
+        products_this_store_count += written
+        if HTTP_CACHE and not page_complete:
+            HTTP_CACHE.forget(url) # Skipped rows: fetch the page in full next time
+        if spool is not None:
+            if page_complete:
+                spooled_pages.append((page, url, response.headers, product_count))
+            else:
+                spooled_pages.append((page, None, None, None)) # Checkpointed, but its validators are not cached
+            print(f"Page {page} for {store_name} (found {product_count} products) spooled ({spool.row_count} rows pending).")
+            if spool.row_count >= BULK_LOAD_FLUSH_ROWS and not flush_spool():
+                break
+            page += 1
+            continue
+        save_checkpoint(cursor, base_url, page)
+
+        timed_commit(db_connection, store=store_name) # Commit after processing all products on a page (and its checkpoint)
+        if HTTP_CACHE and page_complete:
+            # Only remember validators once all of the page's rows are committed
+            HTTP_CACHE.store(url, response, product_count=product_count)
+        print(f"Page {page} for {store_name} (found {product_count} products) committed to DB. Total for this store so far: {products_this_store_count}")
+        page += 1
+
+    if spool is not None:
+        flush_spool() # Pages spooled before an early stop are still good
+        spool.close()
+    cursor.close()
+    if HTTP_CACHE:
+        HTTP_CACHE.save()
+    print(f"Finished scraping {store_name}. Total products from this store: {products_this_store_count}")
+    return products_this_store_count, reached_end
+
+def list_collections(base_url, store_name):
+    """Returns the handles of a store's collections from /collections.json (every page)."""
+    handles = []
+    page = 1
+    while True:
+        url = f"{base_url}/collections.json?page={page}&limit=250"
+        response = fetch_products_page(url, store_name, page)
+        if response is None:
+            break
+        try:
+            collections = response.json().get('collections') or []
+        except (ValueError, AttributeError):
+            print(f"Failed to decode JSON from {url}. Content snippet: {response.text[:200]}")
+            break
+        if not collections:
+            break
+        handles.extend(c['handle'] for c in collections if c.get('handle') and c['handle'] not in SKIPPED_COLLECTIONS)
+        page += 1
+    return handles
+
+def fetch_collection_shard(base_url, store_name, handle, parsed_pages):
+    """Shard worker: pages through one collection, putting parsed pages on `parsed_pages`.
+    Returns True if the end of the collection was reached."""
+    page = 1
+    while True:
+        url = products_page_url(base_url, page, collection=handle)
+        print(f"Fetching: {url}")
+        conditional_headers = HTTP_CACHE.conditional_headers(url) if HTTP_CACHE else None
+        response = fetch_products_page(url, store_name, page, conditional_headers)
+        if response is None:
+            return False
+        if response.status_code == 304:
+            page += 1
+            continue
+        try:
+            records, _, product_count = parse_products_page(iter_products(response.content), base_url, store_name)
+        except ProductStreamError:
+            print(f"Failed to decode JSON from {url}. Content snippet: {response.text[:200]}")
+            return False
+        if not product_count:
+            if HTTP_CACHE:
+                HTTP_CACHE.forget(url) # Always re-check the end of the collection
+            return True
+        parsed_pages.put((handle, page, url, response.headers, records, product_count))
+        page += 1
+
+def scrape_store_sharded(db_connection, base_url, incremental=False, start_page=1):
+    """Scrapes one store collection by collection, with the collections fetched in parallel.
+
+    Shard workers fetch and parse; this thread is the only DB writer and drops products already
+    written by another shard. Stores without collections fall back to scrape_store(). Products
+    that belong to no collection are not reached, so sharded crawls never sweep removed products.
+    Only a finished store is checkpointed, so `start_page` is honoured by the fallback alone.
+    With BULK_LOAD, every page is bulk-loaded through a spool, as in the pipeline writer.
+    Returns the product count.
+    """
+    store_name = get_store_name(base_url)
+    print(f"\nScraping store: {store_name} from {base_url} (sharded by collection)")
+    handles = list_collections(base_url, store_name)
+    if not handles:
+        print(f"No collections found for {store_name}. Falling back to /products.json.")
+        return scrape_store(db_connection, base_url, incremental, start_page)
+    if start_page > 1:
+        print(f"Sharded crawls are not checkpointed per page: {store_name} restarts from the first page of every collection.")
+    config = STORE_REGISTRY.get(base_url) if STORE_REGISTRY else None
+    shard_workers = max(1, config.max_concurrency if config else MAX_REQUESTS_PER_HOST)
+    print(f"{store_name}: {len(handles)} collections, {shard_workers} shard workers.")
+
+    cursor = db_connection.cursor()
+    max_allowed_packet = get_max_allowed_packet(cursor)
+    known_products = load_known_products(cursor, store_name) if incremental else None
+    written_urls = set() # product_url = base_url + handle, so this dedupes by handle
+    parsed_pages = queue.Queue(maxsize=PIPELINE_WRITE_QUEUE_SIZE)
+    shard_results = []
+    products_this_store_count = 0
+    spool = ProductSpool(store_name) if BULK_LOAD else None
+
+    def run_shard(handle):
+        try:
+            shard_results.append(fetch_collection_shard(base_url, store_name, handle, parsed_pages))
+        except Exception as e:
+            print(f"Collection {handle} of {store_name} failed with an unexpected error: {e}")
+            shard_results.append(False)
+        finally:
+            parsed_pages.put(None) # One end marker per shard
+
+    with ThreadPoolExecutor(max_workers=shard_workers) as executor:
+        for handle in handles:
+            executor.submit(run_shard, handle)
+        shards_done = 0
+        while shards_done < len(handles):
+            item = parsed_pages.get()
+            if item is None:
+                shards_done += 1
+                continue
+            handle, page, url, headers, records, product_count = item
+            try:
+                records = [record for record in records if record.product_url not in written_urls]
+                new_urls = [record.product_url for record in records]
+                if known_products is not None:
+                    records = filter_changed_records(records, known_products)
+                written, page_complete = write_product_records(cursor, records, max_allowed_packet, spool)
+                products_this_store_count += written
+                if spool is not None:
+                    products_this_store_count += bulk_upsert_products(cursor, spool, store_name)
+                timed_commit(db_connection, store=store_name)
+                written_urls.update(new_urls) # Only once committed: another collection may still write them
+                if HTTP_CACHE and page_complete:
+                    HTTP_CACHE.store_headers(url, headers, product_count=product_count)
+                elif HTTP_CACHE:
+                    HTTP_CACHE.forget(url)
+                print(f"Collection {handle} page {page} for {store_name}: {len(records)} new of {product_count} products committed. "
+                      f"Total for this store so far: {products_this_store_count}")
+            except Exception as e: # Anything escaping here would stop the draining and hang the shard workers
+                print(f"Error writing collection {handle} page {page} for {store_name}: {e}")
+                try:
+                    db_connection.rollback()
+                except mysql.connector.Error as err:
+                    print(f"Rollback failed: {err}")
+                shard_results.append(False)
+
+    if all(shard_results):
+        save_checkpoint(cursor, base_url, 0, completed=True)
+        timed_commit(db_connection, store=store_name)
+    if spool is not None:
+        spool.close()
+    cursor.close()
+    if HTTP_CACHE:
+        HTTP_CACHE.save()
+    print(f"Finished scraping {store_name}. {len(written_urls)} distinct products across {len(handles)} collections.")
+    return products_this_store_count
+
+def crawl_stores_concurrently(store_urls, incremental=False, start_pages=None):
+    """Scrapes many stores at once on a thread pool, each worker thread using its own DB connection.
+
+    Total in-flight requests are capped by MAX_CONCURRENT_REQUESTS and requests per store
+    host by the registry's max_concurrency (see HOST_LIMITER). Stores start in priority order.
+    """
+    thread_state = threading.local()
+    worker_connections = []
+    connections_lock = threading.Lock()
+
+    def scrape_store_in_worker(base_url):
+        # mysql.connector connections are not thread-safe, so each worker keeps its own
+        if getattr(thread_state, 'db_connection', None) is None:
+            thread_state.db_connection = db_connect()
+            if thread_state.db_connection:
+                with connections_lock:
+                    worker_connections.append(thread_state.db_connection)
+        if not thread_state.db_connection:
+            print(f"No database connection in worker. Skipping {base_url}.")
+            return 0
+        return scrape_store(thread_state.db_connection, base_url, incremental, (start_pages or {}).get(base_url, 1))
 
     total_products_affected = 0
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+        futures = {executor.submit(scrape_store_in_worker, base_url): base_url for base_url in store_urls}
+        for future in as_completed(futures):
+            try:
+                total_products_affected += future.result()
+            except Exception as e:
+                print(f"Store {futures[future]} failed with an unexpected error: {e}")
+
+    for conn in worker_connections:
+        conn.close()
+    return total_products_affected
 
-    for base_url in stores:
-        # Simple store name extraction (can be improved if needed)
-        store_name_parts = base_url.replace("https://www.", "").replace("https://", "").split('.')
-        store_name = store_name_parts[0] if store_name_parts else base_url
+class PipelineStore:
+    """Per-store bookkeeping shared by the fetch, parse and write stages of the pipeline."""
 
-        print(f"\nScraping store: {store_name} from {base_url}")
-        page = 1
-        products_this_store_count = 0
+    def __init__(self, base_url, start_page=1):
+        self.base_url = base_url
+        self.store_name = get_store_name(base_url)
+        self.start_page = start_page
+        self.exhausted = threading.Event() # Set by the parse stage at the end of the catalog
+        self.window = threading.Semaphore(PIPELINE_PREFETCH_PAGES) # Pages fetched but not parsed yet
+        self.pages_fetched = None # Known once the fetch stage is done with this store
+        self.pages_written = 0
+        self.products_count = 0
+        self.known_products = None
+        self.seen_products_started = False
+        self.seen_all_pages = start_page == 1 # Cleared if any page's products can't be accounted for
+        self.seen_product_count = 0 # No sweep after a crawl that saw no products at all
+        self.reached_end = False
+        self.last_page = None # Last page with products, once the end of the catalog was reached
+        self.finished = False
+        self.checkpoint_page = start_page - 1 # Every page up to here is committed
+        self._done_pages = set()
 
+    def mark_page_done(self, page):
+        """Records a committed page; returns True if the contiguous checkpoint moved forward."""
+        self._done_pages.add(page)
+        advanced = False
+        while self.checkpoint_page + 1 in self._done_pages:
+            self.checkpoint_page += 1
+            self._done_pages.discard(self.checkpoint_page)
+            advanced = True
+        return advanced
+
+def pipeline_fetch_store(store, fetch_queue):
+    """Fetch stage: walks a store's pages, staying at most PIPELINE_PREFETCH_PAGES ahead of the parser."""
+    print(f"\nScraping store: {store.store_name} from {store.base_url}" + (f" (resuming at page {store.start_page})" if store.start_page > 1 else ""))
+    page = store.start_page
+    pages_fetched = 0
+    try:
         while True:
-            # Use limit=250 for fewer requests
-            url = f"{base_url}/products.json?page={page}&limit=250"
+            store.window.acquire()
+            if store.exhausted.is_set():
+                store.window.release()
+                break
+            url = products_page_url(store.base_url, page)
             print(f"Fetching: {url}")
+            conditional_headers = HTTP_CACHE.conditional_headers(url) if HTTP_CACHE else None
+            response = fetch_products_page(url, store.store_name, page, conditional_headers)
+            if response is None:
+                store.window.release()
+                break # Stop processing this store on HTTP errors
+            fetch_queue.put((store, page, url, response))
+            pages_fetched += 1
+            page += 1
+    finally:
+        fetch_queue.put((store, pages_fetched, None, None)) # End marker carrying the number of pages fetched
 
-            try:
-                response = requests.get(url, headers=REQUEST_HEADERS, timeout=30) # Increased timeout
-                response.raise_for_status()  # Raises HTTPError for bad responses (4XX or 5XX)
-            except requests.exceptions.HTTPError as http_err:
-                status_code = http_err.response.status_code
-                if status_code == 404:
-                    print(f"Page {page} not found for {store_name} (404), likely end of products for this store.")
-                elif status_code == 401 or status_code == 403:
-                    print(f"Access Denied (401/403) for {url}. Store might be private or block scraping.")
-                elif status_code == 429: # Too Many Requests
-                    print(f"Rate limited (429) at {url}. Waiting 60 seconds before trying next store or stopping.")
-                    time.sleep(60) # Simple wait, could implement exponential backoff
+def pipeline_parse_stage(fetch_queue, write_queue):
+    """Parse stage: decodes fetched pages into ProductRecords. Exits on a None sentinel.
+
+    Every fetched page yields exactly one writer message whose status is 'rows',
+    'not_modified', 'end_of_catalog' or 'failed'.
+    """
+    while True:
+        item = fetch_queue.get()
+        if item is None:
+            break
+        store, page, url, response = item
+        if url is None:
+            write_queue.put(('end', store, page))
+            continue
+
+        status, records, product_urls, product_count = 'failed', None, None, 0
+        try:
+            if response.status_code == 304:
+                cached = HTTP_CACHE.get(url) or {}
+                print(f"Page {page} for {store.store_name} not modified since last crawl ({cached.get('product_count', '?')} products). Skipping.")
+                status = 'not_modified'
+            else:
+                records, product_urls, product_count = parse_products_page(iter_products(response.content), store.base_url, store.store_name)
+                if product_count:
+                    status = 'rows'
                 else:
-                    print(f"HTTP error fetching {url}: {http_err}")
-                break # Stop processing this store on HTTP errors
-            except requests.exceptions.RequestException as req_err: # Other errors (timeout, connection)
-                print(f"Request error fetching {url}: {req_err}")
-                break # Stop processing this store
+                    if HTTP_CACHE:
+                        HTTP_CACHE.forget(url) # Always re-check the end of the catalog
+                    if not store.exhausted.is_set():
+                        if page == 1:
+                            print(f"No products found on the first page for {store.store_name}. The /products.json endpoint might be disabled or empty.")
+                        else:
+                            print(f"No more products found on page {page} for {store.store_name}.")
+                    store.exhausted.set() # End of products for this store
+                    status = 'end_of_catalog'
+        except ProductStreamError:
+            records = None
+            print(f"Failed to decode JSON from {url}. Content snippet: {response.text[:200]}")
+            store.exhausted.set() # Stop processing this store
+        except Exception as e:
+            print(f"Unexpected error parsing {url}: {e}")
+            store.exhausted.set()
+        finally:
+            store.window.release()
+        write_queue.put(('page', store, page, url, response, status, records, product_urls, product_count))
 
+def pipeline_write_stage(db_connection, write_queue, incremental):
+    """DB writer stage: the only user of `db_connection`. Exits on a None sentinel."""
+    cursor = db_connection.cursor()
+    max_allowed_packet = get_max_allowed_packet(cursor)
+    spool = ProductSpool("pipeline") if BULK_LOAD else None
+    while True:
+        item = write_queue.get()
+        if item is None:
+            break
+        store = item[1]
+        if item[0] == 'end':
+            store.pages_fetched = item[2]
+        else:
+            _, _, page, url, response, status, records, product_urls, product_count = item
             try:
-                data = response.json()
-            except requests.exceptions.JSONDecodeError:
-                print(f"Failed to decode JSON from {url}. Content snippet: {response.text[:200]}")
-                break # Stop processing this store
-
-            products_on_page = data.get("products", [])
-            if not products_on_page:
-                if page == 1:
-                    print(f"No products found on the first page for {store_name}. The /products.json endpoint might be disabled or empty.")
-                else:
-                    print(f"No more products found on page {page} for {store_name}.")
-                break # End of products for this store
+                if not store.seen_products_started:
+                    start_seen_products(cursor, store.store_name)
+                    store.seen_products_started = True
+                if status == 'rows':
+                    record_page_products(cursor, store.store_name, url, page, product_urls, response.headers)
+                    store.seen_product_count += len(product_urls)
+                    if incremental:
+                        if store.known_products is None:
+                            store.known_products = load_known_products(cursor, store.store_name)
+                        parsed_count = len(records)
+                        records = filter_changed_records(records, store.known_products)
+                        print(f"Page {page} for {store.store_name}: {len(records)} of {parsed_count} products changed since last crawl.")
+                    written, page_complete = write_product_records(cursor, records, max_allowed_packet, spool)
+                    store.products_count += written
+                    if spool is not None:
+                        store.products_count += bulk_upsert_products(cursor, spool, store.store_name)
+                elif status == 'not_modified':
+                    cached_count = record_cached_page_products(cursor, store.store_name, url)
+                    if not cached_count:
+                        store.seen_all_pages = False
+                    store.seen_product_count += cached_count
+                elif status == 'failed':
+                    store.seen_all_pages = False
+                if status in ('rows', 'not_modified'):
+                    if store.mark_page_done(page):
+                        save_checkpoint(cursor, store.base_url, store.checkpoint_page)
+                    timed_commit(db_connection, store=store.store_name) # Commit after processing all products on a page (and its checkpoint)
+                if status == 'rows':
+                    if HTTP_CACHE and page_complete:
+                        HTTP_CACHE.store(url, response, product_count=product_count)
+                    elif HTTP_CACHE:
+                        HTTP_CACHE.forget(url) # Skipped rows: fetch the page in full next time
+                    print(f"Page {page} for {store.store_name} (found {product_count} products) committed to DB. Total for this store so far: {store.products_count}")
+                elif status == 'end_of_catalog':
+                    store.reached_end = True
+                    store.last_page = page - 1
+            except Exception as e:
+                print(f"Error writing page {page} for {store.store_name}: {e}")
+                store.seen_all_pages = False
+                try:
+                    db_connection.rollback() # Don't let the next page's commit include half of this one
+                except mysql.connector.Error as err:
+                    print(f"Rollback failed: {err}")
+            store.pages_written += 1
 
-            for product in products_on_page:
+        if not store.finished and store.pages_fetched is not None and store.pages_written >= store.pages_fetched:
+            store.finished = True
+            if store.reached_end:
                 try:
-                    title = product.get('title', 'N/A')
-                    vendor = product.get('vendor', 'N/A')
-
-                    # Safely get first variant's data
-                    variants = product.get('variants', [])
-                    first_variant = variants[0] if variants else {} # Default to empty dict if no variants
-
-                    price_str = first_variant.get('price', '0.0')
-                    price = float(price_str) if price_str else 0.0
-
-                    availability = "Available" if first_variant.get('available', False) else "Out of Stock"
-                    
-                    description = product.get('body_html', '') # Often contains HTML tags
-                    category = product.get('product_type', 'N/A')
-                    handle = product.get('handle')
-                    product_link = f"{base_url}/products/{handle}" if handle else 'N/A'
-
-
-                    # SQL query to insert or update data
-                    # Ensure product_url column has a UNIQUE constraint in your DB for this to work
-                    sql_query = """
-                    INSERT INTO products (product_url, title, vendor, price, availability, description, category, store_name)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                        title = VALUES(title),
-                        vendor = VALUES(vendor),
-                        price = VALUES(price),
-                        availability = VALUES(availability),
-                        description = VALUES(description),
-                        category = VALUES(category),
-                        store_name = VALUES(store_name),
-                        scraped_at = CURRENT_TIMESTAMP;
-                    """
-                    values = (
-                        product_link, title, vendor, price, availability,
-                        description, category, store_name
-                    )
-                    cursor.execute(sql_query, values)
-                    total_products_affected += 1
-                    products_this_store_count +=1
-
-                except KeyError as ke:
-                    print(f"Skipping product (KeyError: {ke}) in '{title if 'title' in locals() else 'Unknown Title'}'. Data: {str(product)[:100]}...")
-                except ValueError as ve:
-                    print(f"Skipping product (ValueError: {ve}) in '{title if 'title' in locals() else 'Unknown Title'}', likely price conversion. Price string: '{price_str if 'price_str' in locals() else 'Unknown'}'.")
-                except Exception as e:
-                    print(f"Skipping product '{title if 'title' in locals() else 'Unknown Title'}' due to an unexpected error: {e}")
-
-            db_connection.commit() # Commit after processing all products on a page
-            print(f"Page {page} for {store_name} (found {len(products_on_page)} products) committed to DB. Total for this store so far: {products_this_store_count}")
-            page += 1
-            time.sleep(1.5) # Be respectful, slight increase
+                    if store.seen_all_pages and store.seen_product_count:
+                        sweep_removed_products(cursor, store.store_name, PURGE_REMOVED_PRODUCTS)
+                    forget_pages_beyond(cursor, store.store_name, store.last_page)
+                    save_checkpoint(cursor, store.base_url, store.checkpoint_page, completed=True)
+                    timed_commit(db_connection, store=store.store_name)
+                except mysql.connector.Error as err:
+                    print(f"Could not mark {store.store_name} as completed: {err}")
+                    try:
+                        db_connection.rollback()
+                    except mysql.connector.Error as rollback_err:
+                        print(f"Rollback failed: {rollback_err}")
+            if HTTP_CACHE:
+                HTTP_CACHE.save()
+            print(f"Finished scraping {store.store_name}. Total products from this store: {store.products_count}")
+    if spool is not None:
+        spool.close()
+    cursor.close()
+
+def crawl_stores_pipelined(db_connection, store_urls, incremental=False, start_pages=None):
+    """Runs fetching, parsing and DB writes as separate stages joined by bounded queues.
+
+    Network I/O for later pages overlaps with parsing and MySQL writes for earlier ones,
+    while the bounded queues keep memory flat when one stage falls behind.
+    """
+    fetch_queue = queue.Queue(maxsize=PIPELINE_FETCH_QUEUE_SIZE)
+    write_queue = queue.Queue(maxsize=PIPELINE_WRITE_QUEUE_SIZE)
+    pipeline_stores = [PipelineStore(base_url, (start_pages or {}).get(base_url, 1)) for base_url in store_urls]
 
-        print(f"Finished scraping {store_name}. Total products from this store: {products_this_store_count}")
-        time.sleep(3) # Pause between different stores
+    writer = threading.Thread(target=pipeline_write_stage, args=(db_connection, write_queue, incremental), name="db-writer")
+    parsers = [threading.Thread(target=pipeline_parse_stage, args=(fetch_queue, write_queue), name=f"parser-{i}")
+               for i in range(PIPELINE_PARSER_THREADS)]
+    writer.start()
+    for parser_thread in parsers:
+        parser_thread.start()
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+        futures = {executor.submit(pipeline_fetch_store, store, fetch_queue): store for store in pipeline_stores}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Store {futures[future].base_url} failed with an unexpected error: {e}")
 
+    for _ in parsers:
+        fetch_queue.put(None)
+    for parser_thread in parsers:
+        parser_thread.join()
+    write_queue.put(None)
+    writer.join()
+    return sum(store.products_count for store in pipeline_stores)
+
+def crawl_stores_from_queue(db_connection, incremental=False, enqueue=False, worker_id=None):
+    """Worker loop for distributed crawls: claims one store at a time from the crawl_jobs table.
+
+    Any number of processes, on any machines pointing at the same MySQL, can run this. A store
+    whose worker died is re-queued when its lease expires and continues from its checkpoint.
+    """
+    cursor = db_connection.cursor()
+    create_jobs_table_if_not_exists(cursor)
+    if enqueue:
+        reset_checkpoints(cursor, stores) # A new crawl round starts every store from page 1
+    db_connection.commit()
+    cursor.close()
+
+    work_queue = WorkQueue(db_connection, db_connect, SHOPIFY_QUEUE_NAME, worker_id)
+    if enqueue:
+        work_queue.enqueue([(base_url, {'base_url': base_url}) for base_url in stores], reset=True)
+
+    def crawl_store_job(job_key, payload):
+        base_url = payload['base_url']
+        job_cursor = db_connection.cursor()
+        start_page = plan_resume(job_cursor, [base_url]).get(base_url)
+        job_cursor.close()
+        if start_page is None:
+            return 0 # Completed by a previous lease holder
+        products, reached_end = scrape_store_catalog(db_connection, base_url, incremental, start_page)
+        if not reached_end and not lease_lost():
+            # Released, not completed: retried (from the checkpoint) until MAX_ATTEMPTS
+            raise IncompleteJob(f"{base_url} stopped before the end of its catalog")
+        return products
+
+    return run_worker(work_queue, crawl_store_job)
+
+
+# --- Main Script Logic ---
+def main(mode='sequential', use_http_cache=True, refresh=False, incremental=False, archive=False, replay=False,
+         resume=False, http2=False, enqueue=False, worker_id=None, store_registry_path=STORE_REGISTRY_PATH,
+         bulk_load=False, purge_removed=False, metrics_file=None, metrics_port=None):
+    global HTTP_CACHE, RESPONSE_ARCHIVE, REPLAY_MODE, HTTP_SESSION, BULK_LOAD, PURGE_REMOVED_PRODUCTS
+    use_store_registry(store_registry_path)
+    export_metrics(metrics_file, metrics_port)
+    BULK_LOAD = bulk_load
+    PURGE_REMOVED_PRODUCTS = purge_removed
+    if http2:
+        HTTP_SESSION = build_http2_session(headers=REQUEST_HEADERS)
+    if archive or replay:
+        RESPONSE_ARCHIVE = ResponseArchive(ARCHIVE_DIR)
+    if replay:
+        REPLAY_MODE = True
+        print(f"Replay mode: serving pages from {ARCHIVE_DIR}, no network requests.")
+    elif use_http_cache:
+        HTTP_CACHE = ValidatorCache(HTTP_CACHE_PATH, revalidate=not refresh)
+
+    db_connection = db_connect()
+    if not db_connection:
+        print("Could not connect to database. Exiting.")
+        return
+
+    cursor = db_connection.cursor()
+    create_table_if_not_exists(cursor) # Ensure table exists
+    create_variants_table_if_not_exists(cursor)
+    create_descriptions_table_if_not_exists(cursor)
+    migrate_inline_descriptions(cursor)
+    backfill_description_text(cursor)
+    create_checkpoint_table_if_not_exists(cursor)
+    create_page_products_table_if_not_exists(cursor)
+    if BULK_LOAD and not server_allows_local_infile(cursor):
+        print("The server has local_infile disabled (SET GLOBAL local_infile = 1). Falling back to batched upserts.")
+        BULK_LOAD = False
+    if mode in ('queue', 'scheduler'):
+        start_pages = {} # Workers read checkpoints per claimed store; the scheduler always starts at page 1
+    elif resume:
+        start_pages = plan_resume(cursor, stores)
+    else:
+        reset_checkpoints(cursor, stores)
+        start_pages = {base_url: 1 for base_url in stores}
+    db_connection.commit()
     cursor.close()
+    stores_to_crawl = [base_url for base_url in stores if base_url in start_pages]
+
+    total_products_affected = 0
+
+    if mode == 'queue':
+        total_products_affected = crawl_stores_from_queue(db_connection, incremental, enqueue, worker_id)
+    elif mode == 'scheduler':
+        # Churn is measured from scraped_at, which only moves on real changes in incremental crawls
+        print("Churn-aware scheduler: recrawling due stores in incremental mode. Stop with Ctrl+C.")
+        total_products_affected = run_recrawl_scheduler(
+            db_connection, stores, get_store_name,
+            lambda base_url: scrape_store_catalog(db_connection, base_url, incremental=True))
+    elif mode == 'concurrent':
+        print(f"Concurrent crawl: up to {MAX_CONCURRENT_REQUESTS} requests in flight, per-host limits from the store registry.")
+        total_products_affected = crawl_stores_concurrently(stores_to_crawl, incremental, start_pages)
+    elif mode == 'sharded':
+        for base_url in stores_to_crawl:
+            total_products_affected += scrape_store_sharded(db_connection, base_url, incremental, start_pages[base_url])
+    elif mode == 'pipeline':
+        print(f"Pipelined crawl: {MAX_CONCURRENT_REQUESTS} fetchers, {PIPELINE_PARSER_THREADS} parsers, 1 DB writer.")
+        total_products_affected = crawl_stores_pipelined(db_connection, stores_to_crawl, incremental, start_pages)
+    else:
+        for base_url in stores_to_crawl:
+            total_products_affected += scrape_store(db_connection, base_url, incremental, start_pages[base_url])
+
     db_connection.close()
+    if metrics_file:
+        METRICS.write_file(metrics_file)
     print(f"\nDone scraping all stores. Total products affected (inserted/updated): {total_products_affected}")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scrape Shopify /products.json pages into the products table.")
+    parser.add_argument('--mode', choices=['sequential', 'concurrent', 'pipeline', 'queue', 'scheduler', 'sharded'], default='sequential',
+                        help="'sequential' walks stores one at a time; 'concurrent' crawls many stores at once; "
+                             "'pipeline' overlaps fetching, parsing and DB writes through bounded queues; "
+                             "'queue' runs a worker that claims stores from the shared crawl_jobs table; "
+                             "'scheduler' runs forever, recrawling each store as often as its products change; "
+                             "'sharded' splits each store by collection and pages the collections in parallel.")
+    parser.add_argument('--no-http-cache', action='store_true',
+                        help="Don't send or record ETag/Last-Modified validators.")
+    parser.add_argument('--refresh', action='store_true',
+                        help="Ignore stored validators and re-download every page (validators are still updated).")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only write products whose content hash changed since the last crawl.")
+    parser.add_argument('--archive', action='store_true',
+                        help="Keep every fetched products.json body in the on-disk response archive.")
+    parser.add_argument('--replay', action='store_true',
+                        help="Re-run parsing and upserts from the response archive without touching the network.")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue an interrupted crawl from its checkpoints instead of starting every store at page 1.")
+    parser.add_argument('--http2', action='store_true',
+                        help="Fetch over HTTP/2 (needs httpx[http2]); falls back to pooled HTTP/1.1.")
+    parser.add_argument('--enqueue', action='store_true',
+                        help="With --mode queue: (re)load every store into crawl_jobs as a new round before working.")
+    parser.add_argument('--worker-id', default=None,
+                        help="With --mode queue: name recorded on leased jobs (default host:pid).")
+    parser.add_argument('--stores', default=STORE_REGISTRY_PATH,
+                        help="Store registry JSON file (default: stores.json next to this script).")
+    parser.add_argument('--bulk-load', action='store_true',
+                        help="Write products through a TSV spool, LOAD DATA LOCAL INFILE and a staging table "
+                             "(for very large stores; needs local_infile=ON on the server).")
+    parser.add_argument('--purge-removed', action='store_true',
+                        help="Delete products a complete crawl no longer finds, instead of setting their removed_at.")
+    parser.add_argument('--metrics-file', default=None,
+                        help="Write crawl metrics to this file (Prometheus text, or JSON if it ends in .json), every 15 s and at the end.")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="Serve crawl metrics on http://127.0.0.1:<port>/metrics (and /metrics.json) while crawling.")
+    args = parser.parse_args()
+    main(mode=args.mode, use_http_cache=not args.no_http_cache, refresh=args.refresh, incremental=args.incremental,
+         archive=args.archive, replay=args.replay, resume=args.resume, http2=args.http2,
+         enqueue=args.enqueue, worker_id=args.worker_id, store_registry_path=args.stores,
+         bulk_load=args.bulk_load, purge_removed=args.purge_removed, metrics_file=args.metrics_file,
+         metrics_port=args.metrics_port)
@@ -1,8 +1,19 @@
-from requests_html import HTMLSession
+from requests_html import HTMLSession, HTMLResponse
+import argparse
+import os
 import time
 import mysql.connector
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urljoin # To correctly join relative URLs
 
+from response_archive import ResponseArchive
+from http_transport import build_session
+from work_queue import IncompleteJob, WorkQueue, create_jobs_table_if_not_exists, lease_lost, run_worker
+from product_record import ProductRecord, decode_woo_product
+from record_sink import RecordSink, get_max_allowed_packet
+from crawl_metrics import METRICS, export_metrics, record_response, timed_commit
+from host_limits import HostConcurrencyLimiter, HostRateLimiter
+
 # --- Database Configuration ---
 DB_CONFIG = {
     'host': 'localhost',
@@ -38,11 +49,48 @@ BAREFOOT_CATEGORIES_TO_SCRAPE = [
 ]
 
 # --- Global Session and Headers ---
-s = HTMLSession()
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.4758.102 Safari/537.36'
 }
-s.headers.update(HEADERS)
+s = build_session(HTMLSession, headers=HEADERS) # Shared pooled transport (keep-alive, gzip/brotli, cached DNS)
+
+# --- Concurrent Product Fetching (--workers) ---
+# With more than one worker, a category's product pages are fetched by a thread pool and the parsed
+# records stream into the batched writer as they complete. Politeness then comes from per-host limits
+# instead of the fixed pause between products: at most MAX_REQUESTS_PER_HOST requests in flight and a
+# token bucket of RATE_LIMIT_PER_SECOND requests/second (bursts of RATE_LIMIT_BURST) per host.
+# The default rate is the old sequential pace (about one product page a second): extra workers gain by
+# overlapping slow responses, not by asking more often. --rate-limit raises it where that's acceptable.
+PRODUCT_FETCH_WORKERS = 1 # Set by main(); 1 keeps the sequential loop with its pause between products
+MAX_REQUESTS_PER_HOST = 4
+RATE_LIMIT_PER_SECOND = 1.0
+RATE_LIMIT_BURST = 1
+HOST_LIMITER = HostConcurrencyLimiter(PRODUCT_FETCH_WORKERS, MAX_REQUESTS_PER_HOST) # Resized by main()
+RATE_LIMITER = HostRateLimiter(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+
+# --- Raw Response Archive / Offline Replay ---
+# With --archive every fetched HTML page is kept (gzip, content-addressed) under ARCHIVE_DIR.
+# With --replay pages are served from that archive, so parsing changes can be re-run without re-crawling.
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'response_archive')
+RESPONSE_ARCHIVE = None # Set up in main()
+REPLAY_MODE = False
+
+# --- Metrics (--metrics-file / --metrics-port) ---
+# Fetch, parse, upsert and commit metrics per category (see crawl_metrics.py), all under this store label.
+METRICS_STORE = 'barefootbuttons'
+
+# --- Run-Wide Product Link Index ---
+# A product listed in several categories is fetched once per run; every category listing it is
+# recorded in product_categories (barefoot_products.category keeps the first one it was found in).
+LINK_INDEX = None # Set up in main()
+
+# --- Distributed Work Queue ---
+WOO_QUEUE_NAME = 'barefoot_categories' # One job per category in crawl_jobs
+
+def polite_sleep(seconds):
+    """Pauses between requests to be respectful; skipped in replay mode, where nothing hits the site."""
+    if not REPLAY_MODE:
+        time.sleep(seconds)
 
 def db_connect():
     """Establishes a connection to the MySQL database."""
@@ -83,57 +131,119 @@ def create_barefoot_table_if_not_exists(cursor):
         print(f"Error with barefoot_products table setup: {err}")
 
 
-def insert_product_data(db_conn, product_data, product_url, category_name_from_config):
-    """Inserts or updates product data into the barefoot_products table."""
-    if not db_conn:
-        print("No database connection. Skipping insert.")
-        return
-
-    cursor = db_conn.cursor()
-    sql = """
-    INSERT INTO barefoot_products (product_url, title, price, tag, sku, category)
-    VALUES (%s, %s, %s, %s, %s, %s)
-    ON DUPLICATE KEY UPDATE
-        title = VALUES(title),
-        price = VALUES(price),
-        tag = VALUES(tag),
-        sku = VALUES(sku),
-        category = VALUES(category),
-        scraped_at = CURRENT_TIMESTAMP;
-    """
+def create_product_categories_table_if_not_exists(cursor):
+    """Creates the product_categories table (which categories list each product) if it doesn't already exist."""
     try:
-        values = (
-            product_url,
-            product_data.get('title', 'N/A'),
-            product_data.get('price', 'N/A'),
-            product_data.get('tag', 'N/A'), # This was the 'tag' from your original script
-            product_data.get('sku', 'N/A'),
-            category_name_from_config # Use the category name from our config
-        )
-        cursor.execute(sql, values)
-        # print(f"Data for '{product_data.get('title', 'Unknown')}' queued for DB.") # Less verbose
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS product_categories (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                product_url VARCHAR(1024) NOT NULL,
+                category VARCHAR(100) NOT NULL,
+                scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                UNIQUE KEY uq_product_category (product_url(255), category),
+                INDEX idx_category (category)
+            );
+        """)
+        print("Table 'product_categories' checked/created successfully.")
     except mysql.connector.Error as err:
-        print(f"DB Error for {product_url}: {err}")
-    finally:
-        cursor.close()
+        print(f"Error with product_categories table setup: {err}")
+
+class ProductLinkIndex:
+    """Ordered set of the product links found this run, mapped to the categories listing them."""
+
+    def __init__(self):
+        self.categories = {} # product_url -> [category, ...]; dicts keep discovery order
+        self.fetched = set()
+
+    def __len__(self):
+        return len(self.categories)
+
+    def add(self, link, category):
+        """Records that `category` lists `link`. Returns True if the link is new to this run."""
+        categories = self.categories.get(link)
+        if categories is None:
+            self.categories[link] = [category]
+            return True
+        if category not in categories:
+            categories.append(category)
+        return False
+
+    def needs_fetch(self, link):
+        """True until the link's product page has been fetched and decoded this run."""
+        return link not in self.fetched
+
+    def mark_fetched(self, link):
+        """Called once a link's page was fetched; failed links stay pending so a later category retries them."""
+        self.fetched.add(link)
+
+BAREFOOT_COLUMNS = ('product_url', 'title', 'price', 'tag', 'sku', 'category')
+BAREFOOT_UPDATE_CLAUSE = """
+ON DUPLICATE KEY UPDATE
+    title = VALUES(title),
+    price = VALUES(price),
+    tag = VALUES(tag),
+    sku = VALUES(sku),
+    category = VALUES(category),
+    scraped_at = CURRENT_TIMESTAMP;
+"""
+
+def barefoot_row(record):
+    """The barefoot_products row of a ProductRecord, in BAREFOOT_COLUMNS order."""
+    return (record.product_url, record.title, record.price, record.tag, record.sku, record.category)
+
+MEMBERSHIP_COLUMNS = ('product_url', 'category')
+MEMBERSHIP_UPDATE_CLAUSE = """
+ON DUPLICATE KEY UPDATE
+    scraped_at = CURRENT_TIMESTAMP;
+"""
+
+def barefoot_sink(cursor):
+    """Batched writer of ProductRecords into barefoot_products (same sink as the Shopify scraper)."""
+    return RecordSink(cursor, 'barefoot_products', BAREFOOT_COLUMNS, BAREFOOT_UPDATE_CLAUSE, barefoot_row,
+                      get_max_allowed_packet(cursor))
+
+def store_category_memberships(cursor, links, category):
+    """Records that `category` lists each of `links` in product_categories. Returns the rows written."""
+    sink = RecordSink(cursor, 'product_categories', MEMBERSHIP_COLUMNS, MEMBERSHIP_UPDATE_CLAUSE, tuple,
+                      get_max_allowed_packet(cursor))
+    return sink.write([(link, category) for link in links])
+
+def fetch_page_with_retries(url, retries=3, delay=5, timeout=25, category=''):
+    if REPLAY_MODE:
+        archived = RESPONSE_ARCHIVE.response_for(url)
+        if archived is None:
+            print(f"{url} is not in the response archive.")
+            return None
+        return HTMLResponse._from_response(archived, s)
 
-def fetch_page_with_retries(url, retries=3, delay=5, timeout=25):
     for i in range(retries):
+        r = None
+        started = time.perf_counter()
         try:
-            r = s.get(url, timeout=timeout)
+            RATE_LIMITER.acquire(url) # Wait for a token before taking a request slot
+            with HOST_LIMITER.slot(url):
+                started = time.perf_counter()
+                r = s.get(url, timeout=timeout)
+            record_response(r, time.perf_counter() - started, store=METRICS_STORE, category=category)
             r.raise_for_status()
+            if RESPONSE_ARCHIVE:
+                RESPONSE_ARCHIVE.put(url, r.content, r.headers.get('Content-Type'))
             return r
         except Exception as e:
+            if r is None:
+                record_response(None, time.perf_counter() - started, store=METRICS_STORE, category=category)
             print(f"Error fetching {url} (Attempt {i+1}/{retries}): {e}")
+            if r is not None and r.status_code == 429:
+                RATE_LIMITER.defer(url, delay) # Hold back every worker on this host, not just this one
             if i < retries - 1: time.sleep(delay)
             else: return None
 
-def get_product_links_from_category_page(page_url):
+def get_product_links_from_category_page(page_url, category=''):
     print(f"Fetching product links from: {page_url}")
-    r = fetch_page_with_retries(page_url)
+    r = fetch_page_with_retries(page_url, category=category)
     if not r or not r.html:
         print(f"Failed to fetch/parse HTML for {page_url}")
-        return [], None
+        return None, None # None (not []): the listing is incomplete
 
     product_item_selector = 'div.product-small.box' # Barefoot Buttons specific
     items = r.html.find(product_item_selector)
@@ -163,8 +273,10 @@ def get_product_links_from_category_page(page_url):
         print(f"No 'Next Page' link found on {page_url} (selector: '{next_page_selector}'). End of category or JS pagination.")
     return links, next_page_url
 
-def get_all_product_links_for_category(start_category_url):
-    all_links_for_category = []
+def get_all_product_links_for_category(start_category_url, category=''):
+    """Follows a category's pagination. Returns (links, complete); complete is False if a listing page failed."""
+    all_links_for_category = {} # Ordered set: dict keys keep insertion order, lookups are O(1)
+    complete = True
     current_page_url = start_category_url
     max_pages = 20 # Safety limit
     pages_scraped = 0
@@ -172,13 +284,15 @@ def get_all_product_links_for_category(start_category_url):
     while current_page_url and pages_scraped < max_pages:
         pages_scraped += 1
         print(f"\n--- Scraping links from page {pages_scraped} of category: {current_page_url} ---")
-        links_on_page, next_page_url_candidate = get_product_links_from_category_page(current_page_url)
+        links_on_page, next_page_url_candidate = get_product_links_from_category_page(current_page_url, category)
+        if links_on_page is None:
+            complete = False # Later pages can't be reached without this one's 'Next' link
         
         newly_added = 0
         if links_on_page:
             for link in links_on_page:
                 if link not in all_links_for_category:
-                    all_links_for_category.append(link)
+                    all_links_for_category[link] = None
                     newly_added +=1
             print(f"Collected {newly_added} new links. Total unique links for this category: {len(all_links_for_category)}")
         else:
@@ -186,7 +300,7 @@ def get_all_product_links_for_category(start_category_url):
 
         if next_page_url_candidate and next_page_url_candidate != current_page_url:
             current_page_url = next_page_url_candidate
-            time.sleep(1.5)
+            polite_sleep(1.5)
         else:
             if next_page_url_candidate == current_page_url and next_page_url_candidate is not None :
                  print(f"Warning: Next page URL is same as current. Stopping pagination.")
@@ -194,44 +308,138 @@ def get_all_product_links_for_category(start_category_url):
             
     if pages_scraped == max_pages and current_page_url:
         print(f"Warning: Reached max_pages ({max_pages}) for {start_category_url}.")
-    return all_links_for_category
+    return list(all_links_for_category), complete
 
-def get_product_data(product_url):
+def get_product_data(product_url, category=None):
+    """Fetches one product page and decodes it into a ProductRecord (None if the page can't be fetched)."""
     print(f"Scraping product data from: {product_url}")
-    r = fetch_page_with_retries(product_url)
+    r = fetch_page_with_retries(product_url, category=category or '')
     if not r or not r.html: return None
 
-    product_details = {}
     try:
-        title_el = r.html.find('h1.product_title.entry-title', first=True)
-        product_details['title'] = title_el.full_text.strip() if title_el else 'N/A'
-
-        price_elements = r.html.find('span.woocommerce-Price-amount.amount bdi')
-        if len(price_elements) > 1:
-            product_details['price'] = price_elements[1].full_text.strip()
-        elif price_elements:
-            product_details['price'] = price_elements[0].full_text.strip()
-        else:
-            price_any = r.html.find('p.price span.woocommerce-Price-amount.amount', first=True) # Broader price
-            product_details['price'] = price_any.text.strip() if price_any else 'N/A'
-
-        tag_el = r.html.find('span.tagged_as a[rel=tag]', first=True) # The product 'tag'
-        product_details['tag'] = tag_el.full_text.strip() if tag_el else 'N/A'
-        
-        sku_el = r.html.find('span.sku', first=True)
-        product_details['sku'] = sku_el.full_text.strip() if sku_el else 'N/A'
-        
-        # Note: 'category' field is populated from BAREFOOT_CATEGORIES_TO_SCRAPE.name, not scraped here.
-
-        print(f"Scraped: {product_details}")
-        return product_details
+        # Note: 'category' is populated from BAREFOOT_CATEGORIES_TO_SCRAPE.name, not scraped here.
+        with METRICS.timer('crawl_parse_seconds', store=METRICS_STORE, category=category or ''):
+            record = decode_woo_product(r.html, product_url, category)
+        print(f"Scraped: {record}")
+        return record
     except Exception as e:
         print(f"Error parsing product data for {product_url}: {e}")
-        return {k: 'N/A (Parse Error)' for k in ['title', 'price', 'tag', 'sku']}
+        return ProductRecord(product_url, 'N/A (Parse Error)', price='N/A (Parse Error)', category=category,
+                             tag='N/A (Parse Error)', sku='N/A (Parse Error)')
+
+
+def iter_product_records(links, category):
+    """Yields (link, ProductRecord) for each link (the record is None for pages that can't be fetched).
+
+    With PRODUCT_FETCH_WORKERS > 1 the pages are fetched concurrently and yielded as they complete.
+    """
+    if PRODUCT_FETCH_WORKERS <= 1:
+        for link in links:
+            yield link, get_product_data(link, category)
+            polite_sleep(1) # Be respectful between product page scrapes
+        return
+    with ThreadPoolExecutor(max_workers=PRODUCT_FETCH_WORKERS) as executor:
+        futures = {executor.submit(get_product_data, link, category): link for link in links}
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            for future in futures:
+                future.cancel() # The caller stopped early: don't fetch what's still queued
+
+def scrape_category(db_connection, category_config):
+    """Scrapes every product of one category into barefoot_products. Returns the number of products stored.
+    See scrape_category_listing() for callers that need to know whether the whole listing was crawled."""
+    return scrape_category_listing(db_connection, category_config)[0]
+
+def scrape_category_listing(db_connection, category_config):
+    """Scrapes every product of one category into barefoot_products.
+    Returns (products stored, complete): complete is False if a listing page failed or the crawl stopped early.
+
+    Products already fetched earlier in this run (listed by another category) are not fetched again;
+    the category is still recorded for them in product_categories.
+    """
+    category_name_for_db = category_config['name'] # This will be stored as 'category'
+    category_start_url = category_config['url']
+    print(f"\n{'='*20} Processing Category: {category_name_for_db} ({category_start_url}) {'='*20}")
+
+    product_page_links, complete = get_all_product_links_for_category(category_start_url, category_name_for_db)
+
+    if not product_page_links:
+        print(f"No product links found for category '{category_name_for_db}'. Skipping.")
+        return 0, complete
+
+    for link in product_page_links:
+        LINK_INDEX.add(link, category_name_for_db)
+    links_to_fetch = [link for link in product_page_links if LINK_INDEX.needs_fetch(link)]
+    print(f"\nFound {len(product_page_links)} total unique product links for '{category_name_for_db}' "
+          f"({len(product_page_links) - len(links_to_fetch)} already fetched this run). Extracting data...")
+
+    cursor = db_connection.cursor()
+    memberships = store_category_memberships(cursor, product_page_links, category_name_for_db)
+    METRICS.inc('crawl_rows_upserted_total', memberships,
+                store=METRICS_STORE, category=category_name_for_db, table='product_categories')
+    sink = barefoot_sink(cursor) # Products are written in multi-row batches, not one INSERT each
+    products_in_this_category_db = 0
+    for i, (link, record) in enumerate(iter_product_records(links_to_fetch, category_name_for_db)):
+        if lease_lost():
+            print(f"Lost the crawl_jobs lease on '{category_name_for_db}'; stopping after {i} products.")
+            complete = False
+            break
+        print(f"Processed product {i+1}/{len(links_to_fetch)} for '{category_name_for_db}'.")
+        if record:
+            LINK_INDEX.mark_fetched(link)
+            products_in_this_category_db += sink.add(record) # Only this thread touches the DB
+    products_in_this_category_db += sink.flush()
+    cursor.close()
+    METRICS.inc('crawl_rows_upserted_total', products_in_this_category_db,
+                store=METRICS_STORE, category=category_name_for_db, table='barefoot_products')
+
+    timed_commit(db_connection, store=METRICS_STORE, category=category_name_for_db) # Commit after each category is fully processed
+    print(f"Category '{category_name_for_db}' completed. {products_in_this_category_db} products processed for DB.")
+    return products_in_this_category_db, complete
+
+def crawl_categories_from_queue(db_connection, enqueue=False, worker_id=None):
+    """Worker loop for distributed crawls: claims one category at a time from the crawl_jobs table."""
+    cursor = db_connection.cursor()
+    create_jobs_table_if_not_exists(cursor)
+    cursor.close()
+
+    work_queue = WorkQueue(db_connection, db_connect, WOO_QUEUE_NAME, worker_id)
+    if enqueue:
+        work_queue.enqueue([(config['url'], config) for config in BAREFOOT_CATEGORIES_TO_SCRAPE], reset=True)
+
+    def crawl_category_job(job_key, category_config):
+        products, complete = scrape_category_listing(db_connection, category_config)
+        if not complete and not lease_lost():
+            raise IncompleteJob(f"Listing of category '{category_config['name']}' failed before its last page")
+        return products
+
+    return run_worker(work_queue, crawl_category_job)
 
 
 # --- Main Script Logic ---
-def main():
+def main(archive=False, replay=False, queue=False, enqueue=False, worker_id=None, metrics_file=None, metrics_port=None,
+         workers=1, rate_limit=None):
+    global RESPONSE_ARCHIVE, REPLAY_MODE, LINK_INDEX, PRODUCT_FETCH_WORKERS, HOST_LIMITER
+    global RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST, RATE_LIMITER
+    PRODUCT_FETCH_WORKERS = max(1, workers)
+    HOST_LIMITER = HostConcurrencyLimiter(PRODUCT_FETCH_WORKERS, MAX_REQUESTS_PER_HOST)
+    if rate_limit:
+        RATE_LIMIT_PER_SECOND = rate_limit
+        RATE_LIMIT_BURST = max(1, int(rate_limit))
+        RATE_LIMITER = HostRateLimiter(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+    if PRODUCT_FETCH_WORKERS > 1:
+        print(f"Fetching product pages with {PRODUCT_FETCH_WORKERS} workers "
+              f"(at most {MAX_REQUESTS_PER_HOST} in flight and {RATE_LIMIT_PER_SECOND:g} requests/s per host).")
+    export_metrics(metrics_file, metrics_port)
+    LINK_INDEX = ProductLinkIndex()
+    if archive or replay:
+        RESPONSE_ARCHIVE = ResponseArchive(ARCHIVE_DIR)
+    if replay:
+        REPLAY_MODE = True
+        print(f"Replay mode: serving pages from {ARCHIVE_DIR}, no network requests.")
+
     db_connection = db_connect()
     if not db_connection:
         print("Could not connect to database. Exiting.")
@@ -239,39 +447,46 @@ def main():
     
     cursor = db_connection.cursor()
     create_barefoot_table_if_not_exists(cursor) # Ensure table and category column exist
+    create_product_categories_table_if_not_exists(cursor)
     cursor.close()
 
     total_products_processed_for_db = 0
 
-    for category_config in BAREFOOT_CATEGORIES_TO_SCRAPE:
-        category_name_for_db = category_config['name'] # This will be stored as 'category'
-        category_start_url = category_config['url']
-        print(f"\n{'='*20} Processing Category: {category_name_for_db} ({category_start_url}) {'='*20}")
-
-        product_page_links = get_all_product_links_for_category(category_start_url)
-
-        if not product_page_links:
-            print(f"No product links found for category '{category_name_for_db}'. Skipping.")
-            continue
-
-        print(f"\nFound {len(product_page_links)} total unique product links for '{category_name_for_db}'. Extracting data...")
-        
-        products_in_this_category_db = 0
-        for i, link in enumerate(product_page_links):
-            print(f"Processing product {i+1}/{len(product_page_links)} for '{category_name_for_db}'...")
-            product_info = get_product_data(link)
-            if product_info:
-                insert_product_data(db_connection, product_info, link, category_name_for_db)
-                products_in_this_category_db +=1
-            time.sleep(1) # Be respectful between product page scrapes
-
-        db_connection.commit() # Commit after each category is fully processed
-        print(f"Category '{category_name_for_db}' completed. {products_in_this_category_db} products processed for DB.")
-        total_products_processed_for_db += products_in_this_category_db
-        time.sleep(3) # Pause between categories
+    if queue:
+        total_products_processed_for_db = crawl_categories_from_queue(db_connection, enqueue, worker_id)
+    else:
+        for category_config in BAREFOOT_CATEGORIES_TO_SCRAPE:
+            total_products_processed_for_db += scrape_category(db_connection, category_config)
+            polite_sleep(3) # Pause between categories
 
     db_connection.close()
-    print(f"\nDone scraping all Barefoot Buttons categories. Total products processed for DB: {total_products_processed_for_db}")
+    if metrics_file:
+        METRICS.write_file(metrics_file)
+    print(f"\nDone scraping all Barefoot Buttons categories. Total products processed for DB: {total_products_processed_for_db} "
+          f"({len(LINK_INDEX)} distinct products)")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scrape Barefoot Buttons (WooCommerce) categories into barefoot_products.")
+    parser.add_argument('--archive', action='store_true',
+                        help="Keep every fetched HTML page in the on-disk response archive.")
+    parser.add_argument('--replay', action='store_true',
+                        help="Re-run parsing and upserts from the response archive without touching the network.")
+    parser.add_argument('--queue', action='store_true',
+                        help="Run as a worker claiming categories from the shared crawl_jobs table.")
+    parser.add_argument('--enqueue', action='store_true',
+                        help="With --queue: (re)load every category into crawl_jobs as a new round before working.")
+    parser.add_argument('--worker-id', default=None,
+                        help="With --queue: name recorded on leased jobs (default host:pid).")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Fetch each category's product pages with this many threads, politeness coming from "
+                             "per-host limits instead of a pause after every product (default 1: sequential).")
+    parser.add_argument('--rate-limit', type=float, default=None,
+                        help=f"Requests per second allowed per host (default {RATE_LIMIT_PER_SECOND:g}, the sequential pace).")
+    parser.add_argument('--metrics-file', default=None,
+                        help="Write scrape metrics to this file (Prometheus text, or JSON if it ends in .json), every 15 s and at the end.")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="Serve scrape metrics on http://127.0.0.1:<port>/metrics (and /metrics.json) while scraping.")
+    args = parser.parse_args()
+    main(archive=args.archive, replay=args.replay, queue=args.queue, enqueue=args.enqueue, worker_id=args.worker_id,
+         metrics_file=args.metrics_file, metrics_port=args.metrics_port, workers=args.workers,
+         rate_limit=args.rate_limit)
\ No newline at end of file
@@ -0,0 +1,196 @@
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import tempfile
+import time
+
+import mysql.connector
+
+from fake_shopify_server import FakeCatalog, fleet_stats, start_fleet, stop_fleet
+
+# Crawl throughput benchmark: every Scrapping_Shop.py mode against local fake Shopify stores
+# (fake_shopify_server.py, one port per store), so runs are repeatable and no real store is hit.
+# Each mode runs in a fresh process (its peak RSS is its own) against a dedicated database,
+# starting from empty tables, with the HTTP cache off so every page is really fetched and written.
+# Reports pages/s, products/s, DB rows/s (products + variants) and peak RSS per mode.
+
+BENCH_MODES = ('sequential', 'concurrent', 'pipeline', 'sharded')
+BENCH_DATABASE = 'shopify_bench' # Never the real shopify_data: dropped and recreated before every mode
+BENCH_STORE_PREFIX = 'bench-store-'
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, or None where the resource module is missing (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024 # Bytes on macOS, kilobytes on Linux
+
+
+def write_bench_registry(store_urls, options):
+    """Writes a temporary store registry for the fake stores. Returns its path."""
+    registry = {
+        'defaults': {'max_concurrency': options['max_concurrency'], 'rate_per_second': options['rate_per_second'],
+                     'burst': options['burst'], 'page_size': options['page_size']},
+        'stores': [{'url': url, 'name': f"{BENCH_STORE_PREFIX}{i}"} for i, url in enumerate(store_urls)],
+    }
+    fd, path = tempfile.mkstemp(prefix='bench-stores-', suffix='.json')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(registry, f)
+    return path
+
+
+def reset_bench_database(db_config):
+    """Drops and recreates the bench database, so every mode starts without products, descriptions,
+    checkpoints or page records left by an earlier mode (the crawl creates its tables)."""
+    server_config = {key: value for key, value in db_config.items() if key != 'database'}
+    conn = mysql.connector.connect(**server_config)
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{db_config['database']}`;")
+    cursor.execute(f"CREATE DATABASE `{db_config['database']}`;")
+    cursor.close()
+    conn.close()
+
+
+def count_bench_rows(db_config):
+    """Returns (products rows, product_variants rows) written for the bench stores."""
+    conn = mysql.connector.connect(**db_config)
+    cursor = conn.cursor()
+    counts = []
+    for table in ('products', 'product_variants'):
+        cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE store_name LIKE %s;", (BENCH_STORE_PREFIX + '%',))
+        counts.append(cursor.fetchone()[0])
+    cursor.close()
+    conn.close()
+    return tuple(counts)
+
+
+def run_crawl(mode, store_urls, options, results):
+    """Child process: runs one Scrapping_Shop.main() crawl and puts its timings (or its error) on `results`."""
+    registry_path = None
+    try:
+        import Scrapping_Shop as shop
+
+        if options['database'] == shop.DB_CONFIG['database']:
+            raise ValueError(f"Refusing to benchmark in '{options['database']}': the bench database is dropped first.")
+        shop.DB_CONFIG = dict(shop.DB_CONFIG, database=options['database'])
+        registry_path = write_bench_registry(store_urls, options)
+        reset_bench_database(shop.DB_CONFIG)
+        started = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(sys.stdout if options['verbose'] else devnull):
+            shop.main(mode=mode, use_http_cache=False, store_registry_path=registry_path,
+                      bulk_load=options['bulk_load'])
+        elapsed = time.perf_counter() - started
+        product_rows, variant_rows = count_bench_rows(shop.DB_CONFIG)
+        results.put({'elapsed': elapsed, 'product_rows': product_rows, 'variant_rows': variant_rows,
+                     'peak_rss': peak_rss_bytes()})
+    except Exception as e:
+        results.put({'error': f"{type(e).__name__}: {e}"})
+    finally:
+        if registry_path:
+            os.remove(registry_path)
+
+
+def bench_mode(servers, mode, options):
+    """Runs one mode in a fresh process. Returns its result dict (with the servers' counters)."""
+    context = multiprocessing.get_context('spawn') # Fresh interpreter: no memory or state from earlier modes
+    results = context.Queue()
+    fleet_stats(servers, reset=True)
+    store_urls = [server.store_url(i) for i, server in enumerate(servers)]
+    process = context.Process(target=run_crawl, args=(mode, store_urls, options, results))
+    process.start()
+    result = None
+    while result is None:
+        try:
+            result = results.get(timeout=1.0)
+        except queue.Empty:
+            if process.is_alive():
+                continue
+            try:
+                result = results.get(timeout=1.0) # Put just before the process exited
+            except queue.Empty:
+                result = {'error': f"crawl process exited with code {process.exitcode} before reporting"}
+    process.join()
+    result.update(mode=mode, server=fleet_stats(servers))
+    if 'error' not in result:
+        elapsed = result['elapsed'] or 1e-9
+        pages = result['server'].get('pages', 0)
+        products = result['server'].get('products', 0)
+        rows = result['product_rows'] + result['variant_rows']
+        result.update(pages_per_s=pages / elapsed, products_per_s=products / elapsed, rows_per_s=rows / elapsed)
+    return result
+
+
+def print_report(results):
+    print(f"\n{'mode':<12}{'seconds':>9}{'pages/s':>10}{'products/s':>12}{'rows/s':>10}{'429s':>7}{'peak RSS':>11}")
+    for result in results:
+        if 'error' in result:
+            print(f"{result['mode']:<12} failed: {result['error']}")
+            continue
+        rss = f"{result['peak_rss'] / 2**20:.0f} MB" if result['peak_rss'] else 'n/a'
+        print(f"{result['mode']:<12}{result['elapsed']:>9.2f}{result['pages_per_s']:>10.1f}"
+              f"{result['products_per_s']:>12.1f}{result['rows_per_s']:>10.1f}"
+              f"{result['server'].get('rate_limited', 0):>7}{rss:>11}")
+
+
+def main(modes=BENCH_MODES, store_count=3, products_per_store=1000, variants_per_product=3, description_bytes=500,
+         collection_count=4, latency=0.0, rate_limit_ratio=0.0, retry_after=1, page_size=250, max_concurrency=4,
+         rate_per_second=1000.0, burst=100, bulk_load=False, database=BENCH_DATABASE, verbose=False, json_path=None):
+    catalog = FakeCatalog(store_count, products_per_store, variants_per_product, description_bytes, collection_count)
+    servers = start_fleet(catalog, latency=latency, rate_limit_ratio=rate_limit_ratio, retry_after=retry_after)
+    print(f"Fake Shopify stores on 127.0.0.1: {store_count} stores x {products_per_store} products "
+          f"({variants_per_product} variants, ~{description_bytes} B descriptions), "
+          f"{latency * 1000:.0f} ms latency, {rate_limit_ratio:.0%} 429s.")
+    options = {'page_size': page_size, 'max_concurrency': max_concurrency, 'rate_per_second': rate_per_second,
+               'burst': burst, 'bulk_load': bulk_load, 'database': database, 'verbose': verbose}
+    results = []
+    try:
+        for mode in modes:
+            print(f"Benchmarking --mode {mode}" + (" --bulk-load" if bulk_load else "") + "...")
+            results.append(bench_mode(servers, mode, options))
+    finally:
+        stop_fleet(servers)
+    print_report(results)
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump({'catalog': {'stores': store_count, 'products_per_store': products_per_store,
+                                   'variants_per_product': variants_per_product, 'description_bytes': description_bytes},
+                       'server': {'latency': latency, 'rate_limit_ratio': rate_limit_ratio},
+                       'options': options, 'results': results}, f, indent=2)
+        print(f"Results written to {json_path}.")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark Scrapping_Shop.py crawl modes against a local fake Shopify server.")
+    parser.add_argument('--modes', nargs='+', choices=BENCH_MODES, default=list(BENCH_MODES))
+    parser.add_argument('--stores', type=int, default=3, help="Number of fake stores.")
+    parser.add_argument('--products', type=int, default=1000, help="Products per store.")
+    parser.add_argument('--variants', type=int, default=3, help="Variants per product.")
+    parser.add_argument('--description-bytes', type=int, default=500, help="Approximate body_html size per product.")
+    parser.add_argument('--collections', type=int, default=4, help="Collections per store (for sharded mode).")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Delay the server adds to every response.")
+    parser.add_argument('--rate-limit-ratio', type=float, default=0.0, help="Fraction of requests answered with 429.")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After seconds sent with 429s.")
+    parser.add_argument('--page-size', type=int, default=250, help="products.json ?limit= used by the crawler.")
+    parser.add_argument('--max-concurrency', type=int, default=4, help="Requests in flight per fake store.")
+    parser.add_argument('--rate-per-second', type=float, default=1000.0,
+                        help="Crawler token-bucket rate per store (high by default: measure the crawler, not politeness).")
+    parser.add_argument('--burst', type=int, default=100, help="Crawler token-bucket capacity per store.")
+    parser.add_argument('--bulk-load', action='store_true', help="Run every mode with --bulk-load.")
+    parser.add_argument('--database', default=BENCH_DATABASE,
+                        help="MySQL database for bench rows (dropped and recreated before every mode).")
+    parser.add_argument('--verbose', action='store_true', help="Show the crawler's own output.")
+    parser.add_argument('--json', dest='json_path', default=None, help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+    main(modes=args.modes, store_count=args.stores, products_per_store=args.products, variants_per_product=args.variants,
+         description_bytes=args.description_bytes, collection_count=args.collections, latency=args.latency_ms / 1000.0,
+         rate_limit_ratio=args.rate_limit_ratio, retry_after=args.retry_after, page_size=args.page_size,
+         max_concurrency=args.max_concurrency, rate_per_second=args.rate_per_second, burst=args.burst,
+         bulk_load=args.bulk_load, database=args.database, verbose=args.verbose, json_path=args.json_path)
@@ -0,0 +1,68 @@
+import os
+import tempfile
+
+import mysql.connector
+
+# Escapes for MySQL's default LOAD DATA format: tab-separated fields, '\n' line ends, backslash escapes
+_TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
+
+def tsv_field(value):
+    """Formats one value for LOAD DATA (None becomes \\N, i.e. SQL NULL)."""
+    if value is None:
+        return '\\N'
+    return str(value).translate(_TSV_ESCAPES)
+
+
+class TsvSpool:
+    """Temporary TSV file that rows are appended to until it is bulk-loaded into MySQL."""
+
+    def __init__(self, directory=None, prefix='spool-'):
+        fd, self.path = tempfile.mkstemp(prefix=prefix, suffix='.tsv', dir=directory)
+        self._file = os.fdopen(fd, 'w', encoding='utf-8', newline='\n')
+        self.row_count = 0
+
+    def write_rows(self, rows):
+        for row in rows:
+            self._file.write("\t".join(tsv_field(value) for value in row) + "\n")
+            self.row_count += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def truncate(self):
+        """Empties the spool so it can be reused for the next batch."""
+        self._file.seek(0)
+        self._file.truncate()
+        self.row_count = 0
+
+    def close(self):
+        """Closes and deletes the spool file."""
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def load_spool(cursor, spool, table, columns):
+    """Loads a spool into `table` with LOAD DATA LOCAL INFILE. Returns the number of rows loaded.
+
+    The connection must have been opened with allow_local_infile=True and the server needs
+    local_infile=ON (see server_allows_local_infile()).
+    """
+    spool.flush()
+    cursor.execute(f"""
+        LOAD DATA LOCAL INFILE %s INTO TABLE {table} CHARACTER SET utf8mb4 ({', '.join(columns)});
+    """, (spool.path,))
+    return cursor.rowcount
+
+
+def server_allows_local_infile(cursor):
+    """True if the server accepts LOAD DATA LOCAL INFILE (SET GLOBAL local_infile = 1 enables it)."""
+    try:
+        cursor.execute("SELECT @@GLOBAL.local_infile;")
+        return bool(int(cursor.fetchone()[0]))
+    except (mysql.connector.Error, TypeError, ValueError) as err:
+        print(f"Could not read local_infile ({err}).")
+        return False
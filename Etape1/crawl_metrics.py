@@ -0,0 +1,218 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Counters and histograms for the scrapers and the analysis, exported as Prometheus text
+# (node_exporter textfile collector, or GET /metrics on a local port) or as JSON.
+# Every sample is labeled; labels a call doesn't pass are exported as "".
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+STAGE_BUCKETS = (0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+
+class _Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self, bucket_count):
+        self.counts = [0] * (bucket_count + 1) # Last slot: above the largest bucket (+Inf)
+        self.total = 0.0
+        self.count = 0
+
+
+class Metric:
+    """One counter or histogram family with fixed label names."""
+
+    def __init__(self, name, kind, help_text, label_names, buckets=None):
+        self.name = name
+        self.kind = kind # 'counter' or 'histogram'
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets) if buckets else None
+        self.samples = {} # Label values tuple -> float (counter) or _Histogram
+
+    def key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+
+class MetricsRegistry:
+    """Thread-safe set of metrics. Metrics are declared once, then updated with inc() / observe()."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name, help_text, label_names=()):
+        self._metrics[name] = Metric(name, 'counter', help_text, label_names)
+
+    def histogram(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self._metrics[name] = Metric(name, 'histogram', help_text, label_names, buckets)
+
+    def inc(self, name, amount=1, **labels):
+        metric = self._metrics[name]
+        key = metric.key(labels)
+        with self._lock:
+            metric.samples[key] = metric.samples.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        metric = self._metrics[name]
+        key = metric.key(labels)
+        with self._lock:
+            histogram = metric.samples.get(key)
+            if histogram is None:
+                histogram = metric.samples[key] = _Histogram(len(metric.buckets))
+            histogram.counts[bisect.bisect_left(metric.buckets, value)] += 1
+            histogram.total += value
+            histogram.count += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observes the duration of the with-block (also when it raises)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def render_prometheus(self):
+        """The Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for metric in self._metrics.values():
+                lines.append(f"# HELP {metric.name} {metric.help_text}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                for key, sample in sorted(metric.samples.items()):
+                    labels = list(zip(metric.label_names, key))
+                    if metric.kind == 'counter':
+                        lines.append(f"{metric.name}{_format_labels(labels)} {_format_value(sample)}")
+                        continue
+                    cumulative = 0
+                    for bound, bucket_count in zip(metric.buckets + ('+Inf',), sample.counts):
+                        cumulative += bucket_count
+                        le = bound if bound == '+Inf' else _format_value(bound)
+                        lines.append(f"{metric.name}_bucket{_format_labels(labels + [('le', le)])} {cumulative}")
+                    lines.append(f"{metric.name}_sum{_format_labels(labels)} {_format_value(sample.total)}")
+                    lines.append(f"{metric.name}_count{_format_labels(labels)} {sample.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        """Every sample as plain data: counters as values, histograms as count / sum / buckets."""
+        data = {}
+        with self._lock:
+            for metric in self._metrics.values():
+                samples = []
+                for key, sample in sorted(metric.samples.items()):
+                    entry = {'labels': dict(zip(metric.label_names, key))}
+                    if metric.kind == 'counter':
+                        entry['value'] = sample
+                    else:
+                        entry.update(count=sample.count, sum=sample.total,
+                                     buckets=dict(zip([str(b) for b in metric.buckets] + ['+Inf'], sample.counts)))
+                    samples.append(entry)
+                data[metric.name] = {'type': metric.kind, 'help': metric.help_text, 'samples': samples}
+        return data
+
+    def write_file(self, path):
+        """Writes the metrics atomically: JSON if `path` ends in .json, Prometheus text otherwise."""
+        content = json.dumps(self.to_dict(), indent=2) if path.endswith('.json') else self.render_prometheus()
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp_path, path) # The textfile collector must never read a half-written file
+        except OSError as err:
+            print(f"Could not write metrics to {path}: {err}")
+
+    def start_file_writer(self, path, interval=15.0):
+        """Rewrites `path` every `interval` seconds on a daemon thread (for long runs such as the scheduler)."""
+        def run():
+            while True:
+                time.sleep(interval)
+                self.write_file(path)
+        threading.Thread(target=run, name='metrics-writer', daemon=True).start()
+
+    def serve(self, port, host='127.0.0.1'):
+        """Serves GET /metrics (Prometheus text) and /metrics.json on a daemon thread. Returns the server."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.startswith('/metrics.json'):
+                    body, content_type = json.dumps(registry.to_dict()).encode('utf-8'), 'application/json'
+                elif self.path.startswith('/metrics'):
+                    body, content_type = registry.render_prometheus().encode('utf-8'), 'text/plain; version=0.0.4'
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='metrics-endpoint', daemon=True).start()
+        print(f"Metrics served on http://{host}:{server.server_address[1]}/metrics")
+        return server
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+# --- Shared registry and the metrics every script reports ---
+METRICS = MetricsRegistry()
+
+METRICS.histogram('crawl_fetch_seconds', "Time to fetch a page, body included.", ('store', 'category', 'status'))
+METRICS.histogram('crawl_fetch_time_to_headers_seconds',
+                  "Time from sending a request to receiving its response headers (connect, TLS and server latency).",
+                  ('store', 'category'))
+METRICS.counter('crawl_responses_total', "HTTP responses by status code ('error' for network failures).",
+                ('store', 'category', 'status'))
+METRICS.counter('crawl_fetch_bytes_total', "Response body bytes downloaded.", ('store', 'category'))
+METRICS.histogram('crawl_parse_seconds', "Time to decode and parse one page.", ('store', 'category'))
+METRICS.counter('crawl_rows_upserted_total', "Rows written to the database.", ('store', 'category', 'table'))
+METRICS.histogram('crawl_commit_seconds', "Latency of database commits.", ('store', 'category'))
+METRICS.histogram('analysis_stage_seconds', "Duration of each analysis stage.", ('stage',), buckets=STAGE_BUCKETS)
+METRICS.counter('analysis_rows_total', "Rows read or written by the analysis.", ('source', 'stage'))
+
+
+def record_response(response, elapsed, **labels):
+    """Counts one HTTP response (or None for a network failure) and its fetch time."""
+    status = str(response.status_code) if response is not None else 'error'
+    METRICS.inc('crawl_responses_total', status=status, **labels)
+    METRICS.observe('crawl_fetch_seconds', elapsed, status=status, **labels)
+    if response is None:
+        return
+    if getattr(response, 'elapsed', None) is not None:
+        METRICS.observe('crawl_fetch_time_to_headers_seconds', response.elapsed.total_seconds(), **labels)
+    METRICS.inc('crawl_fetch_bytes_total', len(response.content or b''), **labels)
+
+
+def timed_commit(db_connection, **labels):
+    """db_connection.commit(), with its latency recorded in crawl_commit_seconds."""
+    with METRICS.timer('crawl_commit_seconds', **labels):
+        db_connection.commit()
+
+
+def export_metrics(metrics_file=None, metrics_port=None):
+    """Sets up the exports chosen on the command line (a file rewritten every 15 s, and/or a local endpoint)."""
+    if metrics_port:
+        METRICS.serve(metrics_port)
+    if metrics_file:
+        METRICS.start_file_writer(metrics_file)
@@ -0,0 +1,247 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Local stand-in for Shopify stores, for benchmarks (see bench_crawl.py) and offline testing.
+# Every server answers for every store; store i lives under http://<host>:<port>/store-<i>.
+# start_fleet() runs one server per store, so each fake store has its own host:port (and its own
+# per-host limits in the crawler), like real stores. Catalogs are synthetic and deterministic:
+#   /store-<i>/products.json?page=&limit=
+#   /store-<i>/collections.json?page=
+#   /store-<i>/collections/<handle>/products.json?page=&limit=
+#   /_stats (request counters as JSON; /_stats?reset=1 zeroes them)
+# Pages carry an ETag and answer If-None-Match with 304, like the real endpoint.
+
+MAX_PAGE_SIZE = 250 # Shopify caps ?limit= at 250
+FILLER_WORDS = ('lorem', 'ipsum', 'dolor', 'sit', 'amet', 'organic', 'cotton', 'merino', 'wool', 'soft', 'classic', 'fit')
+
+
+class FakeCatalog:
+    """Synthetic catalogs: `store_count` stores of `products_per_store` products each."""
+
+    def __init__(self, store_count=3, products_per_store=1000, variants_per_product=3, description_bytes=500,
+                 collection_count=4):
+        self.store_count = store_count
+        self.products_per_store = products_per_store
+        self.variants_per_product = variants_per_product
+        self.description_bytes = description_bytes
+        self.collection_count = collection_count
+
+    def store_path(self, index):
+        return f"/store-{index}"
+
+    def collection_handle(self, product_index):
+        return f"collection-{product_index % self.collection_count}"
+
+    def description(self, store_index, product_index):
+        rng = random.Random(store_index * 1000003 + product_index)
+        words = []
+        size = 0
+        while size < self.description_bytes:
+            word = rng.choice(FILLER_WORDS)
+            words.append(word)
+            size += len(word) + 1
+        return f"<p>{' '.join(words)}</p>"
+
+    def product(self, store_index, product_index):
+        variant_base = (store_index * self.products_per_store + product_index) * 100
+        variants = [{
+            'id': variant_base + v,
+            'title': f"Size {v + 1}",
+            'sku': f"S{store_index}-P{product_index}-V{v}",
+            'price': f"{10 + product_index % 90}.{v * 5:02d}",
+            'compare_at_price': None,
+            'available': (product_index + v) % 4 != 0,
+            'option1': f"Size {v + 1}",
+            'option2': None,
+            'option3': None,
+        } for v in range(self.variants_per_product)]
+        return {
+            'id': store_index * self.products_per_store + product_index,
+            'title': f"Product {product_index} of store {store_index}",
+            'handle': f"product-{product_index}",
+            'vendor': f"Vendor {product_index % 7}",
+            'product_type': f"Type {product_index % 5}",
+            'body_html': self.description(store_index, product_index),
+            'updated_at': '2024-01-01T00:00:00+00:00',
+            'variants': variants,
+        }
+
+    def product_indexes(self, collection=None):
+        if collection is None:
+            return range(self.products_per_store)
+        return [i for i in range(self.products_per_store) if self.collection_handle(i) == collection]
+
+    def products_page(self, store_index, page, limit, collection=None):
+        indexes = self.product_indexes(collection)
+        start = (page - 1) * limit
+        return {'products': [self.product(store_index, i) for i in indexes[start:start + limit]]}
+
+    def collections_page(self, page):
+        if page > 1:
+            return {'collections': []}
+        handles = [self.collection_handle(i) for i in range(self.collection_count)] + ['all']
+        return {'collections': [{'handle': handle, 'title': handle} for handle in handles]}
+
+
+class FakeShopifyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # Keep-alive, as the crawler's pooled sessions expect
+
+    def log_message(self, format, *args):
+        pass # One line per request would drown the benchmark output
+
+    def send_body(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        if parts.path == '/_stats':
+            if query.get('reset'):
+                server.reset_stats()
+            return self.send_body(200, json.dumps(server.stats()).encode('utf-8'), {'Content-Type': 'application/json'})
+
+        if server.latency:
+            time.sleep(server.latency)
+        if server.rate_limit_ratio and server.rng_random() < server.rate_limit_ratio:
+            server.count('rate_limited')
+            return self.send_body(429, headers={'Retry-After': str(server.retry_after)})
+
+        segments = parts.path.strip('/').split('/')
+        try:
+            store_index = int(segments[0].split('-', 1)[1])
+            page = max(1, int(query.get('page', ['1'])[0]))
+            limit = min(MAX_PAGE_SIZE, max(1, int(query.get('limit', ['30'])[0])))
+        except (IndexError, ValueError):
+            return self.send_body(404)
+        if not 0 <= store_index < server.catalog.store_count:
+            return self.send_body(404)
+
+        if segments[1:] == ['products.json']:
+            payload = server.catalog.products_page(store_index, page, limit)
+        elif len(segments) == 4 and segments[1] == 'collections' and segments[3] == 'products.json':
+            payload = server.catalog.products_page(store_index, page, limit, collection=segments[2])
+        elif segments[1:] == ['collections.json']:
+            payload = server.catalog.collections_page(page)
+        else:
+            return self.send_body(404)
+
+        etag = f'"{parts.path}:{page}:{limit}"' # The catalog never changes while the server runs
+        if self.headers.get('If-None-Match') == etag:
+            server.count('not_modified')
+            return self.send_body(304, headers={'ETag': etag})
+        body = json.dumps(payload).encode('utf-8')
+        server.count('pages')
+        server.count('products', len(payload.get('products', ())))
+        server.count('bytes', len(body))
+        self.send_body(200, body, {'Content-Type': 'application/json; charset=utf-8', 'ETag': etag})
+
+
+class FakeShopifyServer(ThreadingHTTPServer):
+    """Threaded HTTP server for a FakeCatalog, with injected latency and 429s."""
+
+    daemon_threads = True
+
+    def __init__(self, address, catalog, latency=0.0, rate_limit_ratio=0.0, retry_after=1, seed=0):
+        super().__init__(address, FakeShopifyHandler)
+        self.catalog = catalog
+        self.latency = latency                    # Seconds added to every response
+        self.rate_limit_ratio = rate_limit_ratio  # Fraction of requests answered with 429
+        self.retry_after = retry_after            # Retry-After (seconds) sent with every 429
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def rng_random(self):
+        with self._lock:
+            return self._rng.random()
+
+    def count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] = self._stats.get(key, 0) + amount
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def store_url(self, index):
+        return self.base_url + self.catalog.store_path(index)
+
+
+def start_server(catalog, host='127.0.0.1', port=0, **options):
+    """Starts a FakeShopifyServer on a background thread (port 0 picks a free port). Returns the server."""
+    server = FakeShopifyServer((host, port), catalog, **options)
+    threading.Thread(target=server.serve_forever, name='fake-shopify', daemon=True).start()
+    return server
+
+
+def start_fleet(catalog, host='127.0.0.1', base_port=0, **options):
+    """Starts one server per store of `catalog` (consecutive ports from base_port, or free ports if 0).
+    Store i is served at servers[i].store_url(i)."""
+    return [start_server(catalog, host, base_port + i if base_port else 0, **options)
+            for i in range(catalog.store_count)]
+
+
+def fleet_stats(servers, reset=False):
+    """Sums the request counters of a fleet (optionally zeroing them)."""
+    totals = {}
+    for server in servers:
+        for key, value in server.stats().items():
+            totals[key] = totals.get(key, 0) + value
+        if reset:
+            server.reset_stats()
+    return totals
+
+
+def stop_fleet(servers):
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve synthetic Shopify /products.json catalogs locally.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765, help="Port of store 0; store i listens on port + i.")
+    parser.add_argument('--stores', type=int, default=3, help="Number of stores (/store-0, /store-1, ...).")
+    parser.add_argument('--products', type=int, default=1000, help="Products per store.")
+    parser.add_argument('--variants', type=int, default=3, help="Variants per product.")
+    parser.add_argument('--description-bytes', type=int, default=500, help="Approximate body_html size per product.")
+    parser.add_argument('--collections', type=int, default=4, help="Collections per store (for --mode sharded).")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Delay added to every response.")
+    parser.add_argument('--rate-limit-ratio', type=float, default=0.0, help="Fraction of requests answered with 429.")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After seconds sent with 429s.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for which requests get a 429.")
+    args = parser.parse_args()
+    catalog = FakeCatalog(args.stores, args.products, args.variants, args.description_bytes, args.collections)
+    servers = start_fleet(catalog, args.host, args.port, latency=args.latency_ms / 1000.0,
+                          rate_limit_ratio=args.rate_limit_ratio, retry_after=args.retry_after, seed=args.seed)
+    for i, server in enumerate(servers):
+        print(f"Fake store {i}: {server.store_url(i)} ({args.products} products)")
+    print("Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    stop_fleet(servers)
@@ -0,0 +1,115 @@
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+
+def host_of(url):
+    """Returns the host (with port, if any) used to key per-host limits."""
+    return urlsplit(url).netloc.lower()
+
+
+class HostConcurrencyLimiter:
+    """Caps in-flight requests both globally and for each individual host."""
+
+    def __init__(self, max_total, max_per_host):
+        self.max_total = max_total
+        self.max_per_host = max_per_host
+        self._total = threading.BoundedSemaphore(max_total)
+        self._per_host = {}
+        self._host_limits = {}
+        self._lock = threading.Lock()
+
+    def set_host_limit(self, host, max_in_flight):
+        """Overrides max_per_host for one host. Call before crawling starts."""
+        with self._lock:
+            self._host_limits[host.lower()] = max_in_flight
+            self._per_host.pop(host.lower(), None)
+
+    def _host_semaphore(self, host):
+        with self._lock:
+            semaphore = self._per_host.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self._host_limits.get(host, self.max_per_host))
+                self._per_host[host] = semaphore
+            return semaphore
+
+    @contextmanager
+    def slot(self, url):
+        """Holds one request slot for the host of `url` for the duration of the block."""
+        # Always take the host slot before the global one, so threads queued on a
+        # busy host never sit on global slots that other hosts could use.
+        host_semaphore = self._host_semaphore(host_of(url))
+        with host_semaphore:
+            with self._total:
+                yield
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second, holding at most `capacity` tokens."""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Takes one token and returns how many seconds the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Tokens may go negative: later callers queue up behind earlier reservations
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        """Blocks only as long as the bucket needs, then returns the time waited."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def defer(self, seconds):
+        """Empties the bucket so that the next token is only available `seconds` from now."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens = min(self._tokens, 1 - seconds * self.rate)
+
+
+class HostRateLimiter:
+    """One TokenBucket per host, with a default rate and optional per-host overrides."""
+
+    def __init__(self, default_rate, default_burst, host_overrides=None):
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self._overrides = {host.lower(): limits for host, limits in (host_overrides or {}).items()}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def set_host_rate(self, host, rate, burst):
+        """Overrides the bucket settings for one host (replaces any bucket already created)."""
+        with self._lock:
+            self._overrides[host.lower()] = (rate, burst)
+            self._buckets.pop(host.lower(), None)
+
+    def _bucket(self, host):
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                rate, burst = self._overrides.get(host, (self.default_rate, self.default_burst))
+                bucket = TokenBucket(rate, burst)
+                self._buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url):
+        """Waits for a request token for the host of `url`. Returns the time waited."""
+        return self._bucket(host_of(url)).acquire()
+
+    def defer(self, url, seconds):
+        """Holds back every request to the host of `url` for `seconds` (e.g. after a 429)."""
+        self._bucket(host_of(url)).defer(seconds)
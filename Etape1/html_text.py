@@ -0,0 +1,72 @@
+import re
+from html.parser import HTMLParser
+
+try:
+    import lxml.html # Optional: pip install lxml (C parser, much faster on large descriptions)
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+# Elements that start a new line of text; inline elements (b, a, span...) don't break words apart
+BLOCK_TAGS = frozenset(('address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt', 'figcaption',
+                        'figure', 'footer', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'ol', 'p',
+                        'pre', 'section', 'table', 'td', 'th', 'tr', 'ul'))
+SKIPPED_TAGS = frozenset(('script', 'style', 'template', 'noscript'))
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+class _TextExtractor(HTMLParser):
+    """Stdlib fallback: collects text nodes, with a break at block elements and entities decoded."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def _text_lxml(html):
+    try:
+        root = lxml.html.fragment_fromstring(html, create_parent='div')
+    except (etree.ParserError, ValueError):
+        return None
+    etree.strip_elements(root, *SKIPPED_TAGS, with_tail=False)
+    for element in root.iter(*BLOCK_TAGS):
+        element.tail = "\n" + (element.tail or "")
+    return root.text_content()
+
+
+def _text_stdlib(html):
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return "".join(extractor.parts)
+
+
+def html_to_text(html):
+    """Plain text of an HTML fragment (e.g. a Shopify body_html), with whitespace collapsed.
+
+    Uses lxml when it is installed and the stdlib HTML parser otherwise. Returns '' for empty input.
+    """
+    if not html:
+        return ''
+    text = _text_lxml(html) if lxml is not None else None
+    if text is None:
+        text = _text_stdlib(html)
+    return _WHITESPACE.sub(' ', text).strip()
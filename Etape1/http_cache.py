@@ -0,0 +1,75 @@
+import json
+import os
+import threading
+
+
+class ValidatorCache:
+    """Per-URL HTTP validators (ETag / Last-Modified) persisted to a local JSON file.
+
+    Only validators are kept, not bodies: a 304 tells the crawler that what it stored
+    from that URL last time is still current, so there is nothing to parse or write.
+    """
+
+    def __init__(self, path, revalidate=True):
+        self.path = path
+        self.revalidate = revalidate # False: ignore stored validators (forced full refresh) but still record new ones
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+                print(f"Loaded HTTP validators for {len(self._entries)} URLs from {path}.")
+            except (OSError, ValueError) as err:
+                print(f"Could not read HTTP cache {path} ({err}). Starting with an empty cache.")
+
+    def get(self, url):
+        with self._lock:
+            return self._entries.get(url)
+
+    def conditional_headers(self, url):
+        """Returns If-None-Match / If-Modified-Since headers for `url`, if we hold validators for it."""
+        entry = self.get(url) if self.revalidate else None
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url, response, **extra):
+        """Remembers the validators of a 200 response, plus any extra fields (e.g. product_count)."""
+        self.store_headers(url, response.headers, **extra)
+
+    def store_headers(self, url, headers, **extra):
+        """Same as store(), from the response headers alone (so the body need not be kept around)."""
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        with self._lock:
+            if etag or last_modified:
+                self._entries[url] = dict(extra, etag=etag, last_modified=last_modified)
+            else:
+                self._entries.pop(url, None)
+            self._dirty = True
+
+    def forget(self, url):
+        with self._lock:
+            if self._entries.pop(url, None) is not None:
+                self._dirty = True
+
+    def save(self):
+        """Writes the cache to disk atomically (only if something changed)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = json.dumps(self._entries)
+            self._dirty = False
+        tmp_path = f"{self.path}.tmp.{threading.get_ident()}"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(snapshot)
+            os.replace(tmp_path, self.path)
+        except OSError as err:
+            print(f"Could not save HTTP cache to {self.path}: {err}")
@@ -0,0 +1,115 @@
+import socket
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import brotli # Optional: lets urllib3 decode 'br' responses
+    BROTLI_AVAILABLE = True
+except ImportError:
+    try:
+        import brotlicffi # Same, CFFI flavour
+        BROTLI_AVAILABLE = True
+    except ImportError:
+        BROTLI_AVAILABLE = False
+
+try:
+    import httpx # Optional: pip install 'httpx[http2]' for HTTP/2 multiplexing
+except ImportError:
+    httpx = None
+
+# --- Connection Pool Configuration ---
+POOL_HOSTS = 64          # Hosts whose connection pools are kept alive at once
+POOL_MAXSIZE = 10        # Keep-alive connections kept per host
+DNS_CACHE_TTL = 300      # Seconds a resolved address is reused
+
+ACCEPT_ENCODING = 'gzip, deflate, br' if BROTLI_AVAILABLE else 'gzip, deflate'
+
+_dns_cache = {}
+_dns_lock = threading.Lock()
+_original_getaddrinfo = socket.getaddrinfo
+
+
+def _cached_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+    key = (host, port, family, type, proto, flags)
+    now = time.monotonic()
+    with _dns_lock:
+        cached = _dns_cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+    result = _original_getaddrinfo(host, port, family, type, proto, flags)
+    with _dns_lock:
+        _dns_cache[key] = (now + DNS_CACHE_TTL, result)
+    return result
+
+
+def install_dns_cache():
+    """Caches getaddrinfo() results process-wide for DNS_CACHE_TTL seconds (idempotent)."""
+    socket.getaddrinfo = _cached_getaddrinfo
+
+
+def build_session(session_cls=requests.Session, headers=None):
+    """Returns a session with keep-alive pools per host and compressed transfers.
+
+    Reused connections also mean TLS handshakes happen once per pooled connection instead of
+    once per request. Works for any requests.Session subclass (e.g. requests_html.HTMLSession).
+    Retries are left to the callers, which already implement their own policies.
+    """
+    install_dns_cache()
+    session = session_cls()
+    adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update(headers or {})
+    session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+    return session
+
+
+class Http2Session:
+    """HTTP/2 client (via httpx) that hands back plain requests.Response objects.
+
+    One multiplexed connection per host carries all concurrent requests to that host.
+    Errors are re-raised as requests exceptions, so callers written against requests work unchanged.
+    """
+
+    def __init__(self, headers=None):
+        if httpx is None:
+            raise RuntimeError("HTTP/2 needs httpx: pip install 'httpx[http2]'")
+        install_dns_cache()
+        all_headers = dict(headers or {}, **{'Accept-Encoding': ACCEPT_ENCODING})
+        limits = httpx.Limits(max_connections=POOL_HOSTS * POOL_MAXSIZE, max_keepalive_connections=POOL_HOSTS)
+        self._client = httpx.Client(http2=True, headers=all_headers, limits=limits, follow_redirects=True)
+
+    def get(self, url, headers=None, timeout=30, **kwargs):
+        try:
+            r = self._client.get(url, headers=headers, timeout=timeout)
+        except httpx.TimeoutException as err:
+            raise requests.exceptions.Timeout(str(err)) from err
+        except httpx.HTTPError as err:
+            raise requests.exceptions.ConnectionError(str(err)) from err
+        response = requests.models.Response()
+        response._content = r.content
+        response.status_code = r.status_code
+        response.reason = r.reason_phrase
+        response.headers = requests.structures.CaseInsensitiveDict(r.headers.items())
+        response.url = str(r.url)
+        response.encoding = r.encoding
+        response.elapsed = r.elapsed
+        return response
+
+    def close(self):
+        self._client.close()
+
+
+def build_http2_session(headers=None):
+    """Returns an Http2Session if httpx is installed, otherwise a pooled HTTP/1.1 session."""
+    if httpx is None:
+        print("httpx is not installed; falling back to pooled HTTP/1.1 (pip install 'httpx[http2]' for HTTP/2).")
+        return build_session(headers=headers)
+    try:
+        return Http2Session(headers=headers)
+    except ImportError as err: # httpx without the 'h2' extra
+        print(f"HTTP/2 unavailable ({err}); falling back to pooled HTTP/1.1.")
+        return build_session(headers=headers)
@@ -0,0 +1,130 @@
+import hashlib
+
+# Order of the values in a variant tuple (and of the product_variants columns)
+VARIANT_COLUMNS = ('variant_id', 'product_url', 'store_name', 'title', 'sku', 'price', 'compare_at_price', 'available',
+                   'option1', 'option2', 'option3')
+_VARIANT_PRICE = VARIANT_COLUMNS.index('price')
+_VARIANT_AVAILABLE = VARIANT_COLUMNS.index('available')
+
+
+class ProductRecord:
+    """One scraped product, as both scrapers hand it to the batch writers (see record_sink.RecordSink).
+
+    __slots__ keeps every record to a fixed set of attribute slots instead of a per-instance dict;
+    variants are plain tuples in VARIANT_COLUMNS order. Fields a platform doesn't have stay None.
+    """
+
+    __slots__ = ('product_url', 'title', 'vendor', 'price', 'availability', 'description', 'description_hash',
+                 'category', 'store_name', 'sku', 'tag', 'updated_at', 'content_hash', 'variants')
+
+    def __init__(self, product_url, title, vendor=None, price=None, availability=None, description=None,
+                 description_hash=None, category=None, store_name=None, sku=None, tag=None, updated_at=None,
+                 content_hash=None, variants=()):
+        self.product_url = product_url
+        self.title = title
+        self.vendor = vendor
+        self.price = price
+        self.availability = availability
+        self.description = description
+        self.description_hash = description_hash
+        self.category = category
+        self.store_name = store_name
+        self.sku = sku
+        self.tag = tag
+        self.updated_at = updated_at
+        self.content_hash = content_hash
+        self.variants = variants
+
+    def __repr__(self):
+        return f"ProductRecord({self.product_url!r}, title={self.title!r}, price={self.price!r})"
+
+    def variant_aggregates(self):
+        """(min price, max price, variant count, available variant count) over the variants."""
+        prices = [variant[_VARIANT_PRICE] for variant in self.variants if variant[_VARIANT_PRICE] is not None]
+        return (min(prices) if prices else None, max(prices) if prices else None,
+                len(self.variants), sum(variant[_VARIANT_AVAILABLE] for variant in self.variants))
+
+
+def description_hash(description):
+    """SHA-1 of a body_html (the product_descriptions key), or None for an empty description."""
+    if not description:
+        return None
+    return hashlib.sha1(str(description).encode('utf-8')).hexdigest()
+
+
+def content_hash(values):
+    """SHA-1 over the stored product fields, so unchanged products can be recognised cheaply."""
+    return hashlib.sha1("\x1f".join(str(v) for v in values).encode('utf-8')).hexdigest()
+
+
+# --- Shopify (/products.json) ---
+def shopify_product_url(base_url, handle):
+    """The product_url stored for a product handle ('N/A' without one)."""
+    return f"{base_url}/products/{handle}" if handle else 'N/A'
+
+
+def decode_shopify_variant(variant, product_url, store_name):
+    """Turns one variant into a tuple in VARIANT_COLUMNS order (None if it has no id)."""
+    if variant.get('id') is None:
+        return None
+    price = variant.get('price')
+    compare_at_price = variant.get('compare_at_price')
+    return (variant['id'], product_url, store_name, variant.get('title'), variant.get('sku'),
+            float(price) if price else None, float(compare_at_price) if compare_at_price else None,
+            1 if variant.get('available', False) else 0,
+            variant.get('option1'), variant.get('option2'), variant.get('option3'))
+
+
+def decode_shopify_product(product, base_url, store_name):
+    """Turns one product dict from /products.json (e.g. from shopify_stream.iter_products()) into a ProductRecord.
+
+    Raises ValueError on unparseable prices, like float() does.
+    """
+    title = product.get('title', 'N/A')
+    vendor = product.get('vendor', 'N/A')
+
+    # Safely get first variant's data
+    variants = product.get('variants', [])
+    first_variant = variants[0] if variants else {} # Default to empty dict if no variants
+
+    price_str = first_variant.get('price', '0.0')
+    price = float(price_str) if price_str else 0.0
+
+    availability = "Available" if first_variant.get('available', False) else "Out of Stock"
+
+    description = product.get('body_html', '') # Often contains HTML tags; stored once in product_descriptions
+    category = product.get('product_type', 'N/A')
+    handle = product.get('handle')
+    product_link = shopify_product_url(base_url, handle)
+
+    variant_rows = tuple(row for row in (decode_shopify_variant(v, product_link, store_name) for v in variants) if row)
+    content = (product_link, title, vendor, price, availability, description, category, store_name) + variant_rows
+    return ProductRecord(product_link, title, vendor=vendor, price=price, availability=availability,
+                         description=description, description_hash=description_hash(description),
+                         category=category, store_name=store_name, updated_at=product.get('updated_at'),
+                         content_hash=content_hash(content), variants=variant_rows)
+
+
+# --- WooCommerce (product page HTML) ---
+def decode_woo_product(html, product_url, category=None):
+    """Turns a WooCommerce product page (a requests_html HTML object) into a ProductRecord.
+
+    The price is kept as displayed (e.g. '$12.00'). Missing fields become 'N/A'.
+    """
+    title_el = html.find('h1.product_title.entry-title', first=True)
+    title = title_el.full_text.strip() if title_el else 'N/A'
+
+    price_elements = html.find('span.woocommerce-Price-amount.amount bdi')
+    if len(price_elements) > 1:
+        price = price_elements[1].full_text.strip()
+    elif price_elements:
+        price = price_elements[0].full_text.strip()
+    else:
+        price_any = html.find('p.price span.woocommerce-Price-amount.amount', first=True) # Broader price
+        price = price_any.text.strip() if price_any else 'N/A'
+
+    tag_el = html.find('span.tagged_as a[rel=tag]', first=True) # The product 'tag'
+    sku_el = html.find('span.sku', first=True)
+    return ProductRecord(product_url, title, price=price, category=category,
+                         tag=tag_el.full_text.strip() if tag_el else 'N/A',
+                         sku=sku_el.full_text.strip() if sku_el else 'N/A')
@@ -0,0 +1,94 @@
+import mysql.connector
+
+DEFAULT_BATCH_SIZE = 250       # Max rows per multi-row INSERT (a full products.json page)
+DEFAULT_PACKET_HEADROOM = 0.8  # Fraction of max_allowed_packet a single statement may use
+
+
+def build_upsert_sql(table, columns, update_clause, row_count):
+    """Builds a multi-row INSERT ... ON DUPLICATE KEY UPDATE for `row_count` rows."""
+    row_placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+            + ", ".join([row_placeholders] * row_count)
+            + update_clause)
+
+
+def get_max_allowed_packet(cursor):
+    """Reads the server's max_allowed_packet so batches can be sized to fit in one statement."""
+    try:
+        cursor.execute("SELECT @@max_allowed_packet;")
+        return int(cursor.fetchone()[0])
+    except (mysql.connector.Error, TypeError, ValueError) as err:
+        print(f"Could not read max_allowed_packet ({err}). Assuming 4 MB.")
+        return 4 * 1024 * 1024
+
+
+def estimate_row_bytes(values):
+    """Rough upper bound of a row's size inside the SQL statement (escaping and quotes included)."""
+    return sum(2 * len(str(v).encode('utf-8')) + 4 for v in values)
+
+
+def iter_row_batches(rows, max_rows, max_bytes):
+    """Splits rows into batches of at most `max_rows` rows and roughly `max_bytes` bytes."""
+    batch, batch_bytes = [], 0
+    for row in rows:
+        row_bytes = estimate_row_bytes(row)
+        if batch and (len(batch) >= max_rows or batch_bytes + row_bytes > max_bytes):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(row)
+        batch_bytes += row_bytes
+    if batch:
+        yield batch
+
+
+class RecordSink:
+    """Batched upsert writer for ProductRecords, shared by the Shopify and WooCommerce scrapers.
+
+    `row_fn` turns a record into the table's row (in `columns` order). Rows are written with as
+    few multi-row INSERT ... ON DUPLICATE KEY UPDATE statements as max_allowed_packet allows; if a
+    batch is rejected, its rows are retried one by one so a single bad row only loses itself.
+    Records can be written a list at a time (write) or buffered one at a time (add / flush).
+    """
+
+    def __init__(self, cursor, table, columns, update_clause, row_fn, max_allowed_packet,
+                 batch_size=DEFAULT_BATCH_SIZE, packet_headroom=DEFAULT_PACKET_HEADROOM):
+        self.cursor = cursor
+        self.table = table
+        self.columns = columns
+        self.update_clause = update_clause
+        self.row_fn = row_fn
+        self.batch_size = batch_size
+        self.max_bytes = int(max_allowed_packet * packet_headroom)
+        self.single_row_sql = build_upsert_sql(table, columns, update_clause, 1)
+        self.pending = []
+
+    def write(self, records):
+        """Writes records now. Returns the number of rows written."""
+        rows = [self.row_fn(record) for record in records]
+        written = 0
+        for batch in iter_row_batches(rows, self.batch_size, self.max_bytes):
+            try:
+                self.cursor.execute(build_upsert_sql(self.table, self.columns, self.update_clause, len(batch)),
+                                    [v for row in batch for v in row])
+                written += len(batch)
+            except mysql.connector.Error as err:
+                print(f"Batch upsert of {len(batch)} rows into {self.table} failed ({err}). Retrying row by row.")
+                for row in batch:
+                    try:
+                        self.cursor.execute(self.single_row_sql, row)
+                        written += 1
+                    except mysql.connector.Error as row_err:
+                        print(f"Skipping '{row[1]}' ({row[0]}) due to DB error: {row_err}")
+        return written
+
+    def add(self, record):
+        """Buffers a record; writes a batch once batch_size records are pending. Returns rows written."""
+        self.pending.append(record)
+        if len(self.pending) >= self.batch_size:
+            return self.flush()
+        return 0
+
+    def flush(self):
+        """Writes every buffered record. Returns the number of rows written."""
+        records, self.pending = self.pending, []
+        return self.write(records) if records else 0
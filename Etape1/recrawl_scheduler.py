@@ -0,0 +1,184 @@
+import time
+
+import mysql.connector
+
+# --- Recrawl Scheduler Configuration ---
+MIN_RECRAWL_INTERVAL = 3600            # Never crawl a store more often than hourly
+MAX_RECRAWL_INTERVAL = 14 * 24 * 3600  # ...nor less often than every two weeks
+DEFAULT_RECRAWL_INTERVAL = 24 * 3600   # Interval for stores with no history yet
+TARGET_CHANGE_FRACTION = 0.05          # Aim to recrawl once ~5% of a store's products have changed
+CHANGE_RATE_SMOOTHING = 0.3            # EWMA weight of the newest observation
+STORES_PER_CYCLE = 4                   # Crawl budget: stores crawled per scheduling cycle
+MAX_IDLE_SLEEP = 600                   # Re-check the schedule at least this often
+FAILURE_RETRY_DELAY = 15 * 60          # Retry a failed crawl after this long, doubling per consecutive failure
+
+
+def create_schedule_table_if_not_exists(cursor):
+    """Creates the store_crawl_schedule table if it doesn't already exist."""
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS store_crawl_schedule (
+                store_url VARCHAR(255) PRIMARY KEY,
+                store_name VARCHAR(100),
+                change_rate DOUBLE NOT NULL DEFAULT 0, -- Smoothed fraction of products changed per hour
+                recrawl_interval_seconds INT NOT NULL,
+                last_crawl_started_at DATETIME,
+                last_crawl_finished_at DATETIME,
+                last_product_count INT,
+                last_changed_count INT,
+                next_crawl_at DATETIME NOT NULL,
+                consecutive_failures INT NOT NULL DEFAULT 0,
+                INDEX idx_next_crawl (next_crawl_at)
+            );
+        """)
+        print("Table 'store_crawl_schedule' checked/created successfully.")
+    except mysql.connector.Error as err:
+        print(f"Error creating store_crawl_schedule table: {err}")
+    try:
+        cursor.execute("ALTER TABLE store_crawl_schedule ADD COLUMN consecutive_failures INT NOT NULL DEFAULT 0;")
+    except mysql.connector.Error as err:
+        if err.errno != 1060: # Duplicate column name: tables created with it already
+            print(f"Error adding consecutive_failures to store_crawl_schedule: {err}")
+
+
+def register_stores(cursor, store_urls, store_name_fn):
+    """Adds stores that are not scheduled yet; they are due immediately."""
+    cursor.executemany("""
+        INSERT IGNORE INTO store_crawl_schedule (store_url, store_name, recrawl_interval_seconds, next_crawl_at)
+        VALUES (%s, %s, %s, NOW());
+    """, [(url, store_name_fn(url), DEFAULT_RECRAWL_INTERVAL) for url in store_urls])
+
+
+def pick_due_stores(cursor, store_urls, budget):
+    """Returns up to `budget` due stores, most valuable first.
+
+    A store's value is the share of its catalog expected to have changed since its last crawl
+    (change_rate x hours since then); stores never crawled come first.
+    """
+    if not store_urls:
+        return []
+    placeholders = ", ".join(["%s"] * len(store_urls))
+    cursor.execute(f"""
+        SELECT store_url FROM store_crawl_schedule
+        WHERE next_crawl_at <= NOW() AND store_url IN ({placeholders})
+        ORDER BY last_crawl_finished_at IS NOT NULL,
+                 change_rate * TIMESTAMPDIFF(SECOND, last_crawl_finished_at, NOW()) DESC
+        LIMIT %s;
+    """, tuple(store_urls) + (budget,))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def next_interval(change_rate, previous_interval):
+    """Seconds until the next crawl, so that about TARGET_CHANGE_FRACTION of the store has changed by then."""
+    if change_rate <= 0:
+        interval = previous_interval * 2 # Nothing changing: back off
+    else:
+        interval = TARGET_CHANGE_FRACTION / change_rate * 3600
+    return int(min(MAX_RECRAWL_INTERVAL, max(MIN_RECRAWL_INTERVAL, interval)))
+
+
+def record_crawl(cursor, base_url, store_name, started_at):
+    """Measures how many of the store's products changed during the crawl (rows whose scraped_at moved,
+    which incremental crawls only do on change) and reschedules the store accordingly."""
+    cursor.execute("""
+        SELECT COUNT(*), COALESCE(SUM(scraped_at >= %s), 0) FROM products WHERE store_name = %s;
+    """, (started_at, store_name))
+    product_count, changed_count = cursor.fetchone()
+    cursor.execute("""
+        SELECT change_rate, recrawl_interval_seconds, last_crawl_finished_at,
+               TIMESTAMPDIFF(SECOND, last_crawl_finished_at, %s)
+        FROM store_crawl_schedule WHERE store_url = %s;
+    """, (started_at, base_url))
+    previous_rate, previous_interval, last_finished, seconds_since_last = cursor.fetchone()
+
+    if last_finished is None or not product_count:
+        change_rate = previous_rate # First crawl loads everything; it says nothing about churn
+    else:
+        hours = max(seconds_since_last or 0, 60) / 3600
+        observed_rate = (int(changed_count) / product_count) / hours
+        change_rate = CHANGE_RATE_SMOOTHING * observed_rate + (1 - CHANGE_RATE_SMOOTHING) * previous_rate
+    interval = next_interval(change_rate, previous_interval) if last_finished is not None else previous_interval
+
+    cursor.execute("""
+        UPDATE store_crawl_schedule
+        SET change_rate = %s, recrawl_interval_seconds = %s, last_crawl_started_at = %s,
+            last_crawl_finished_at = NOW(), last_product_count = %s, last_changed_count = %s,
+            next_crawl_at = NOW() + INTERVAL %s SECOND, consecutive_failures = 0
+        WHERE store_url = %s;
+    """, (change_rate, interval, started_at, product_count, int(changed_count), interval, base_url))
+    print(f"Scheduler: {store_name} had {int(changed_count)}/{product_count} products change; "
+          f"change rate {change_rate:.4f}/h, next crawl in {interval / 3600:.1f}h.")
+
+
+def record_failure(cursor, base_url):
+    """Pushes a failed store's next crawl back (FAILURE_RETRY_DELAY, doubling per consecutive failure),
+    so a store that keeps failing doesn't take the whole crawl budget of every cycle."""
+    cursor.execute("SELECT consecutive_failures FROM store_crawl_schedule WHERE store_url = %s;", (base_url,))
+    row = cursor.fetchone()
+    failures = row[0] if row else 0
+    delay = min(MAX_RECRAWL_INTERVAL, FAILURE_RETRY_DELAY * 2 ** failures)
+    cursor.execute("""
+        UPDATE store_crawl_schedule
+        SET consecutive_failures = consecutive_failures + 1, next_crawl_at = NOW() + INTERVAL %s SECOND
+        WHERE store_url = %s;
+    """, (delay, base_url))
+    print(f"Scheduler: {base_url} failed {failures + 1} time(s) in a row; retrying in {delay / 60:.0f} min.")
+
+
+def seconds_until_next_due(cursor, store_urls):
+    if not store_urls:
+        return MAX_IDLE_SLEEP
+    placeholders = ", ".join(["%s"] * len(store_urls))
+    cursor.execute(f"""
+        SELECT GREATEST(0, TIMESTAMPDIFF(SECOND, NOW(), MIN(next_crawl_at)))
+        FROM store_crawl_schedule WHERE store_url IN ({placeholders});
+    """, tuple(store_urls))
+    (seconds,) = cursor.fetchone()
+    return MAX_IDLE_SLEEP if seconds is None else min(int(seconds), MAX_IDLE_SLEEP)
+
+
+def run_recrawl_scheduler(db_connection, store_urls, store_name_fn, crawl_store, max_cycles=None):
+    """Long-lived loop: each cycle crawls the most valuable due stores (at most STORES_PER_CYCLE)
+    with `crawl_store(base_url)` -> (products, reached_end), reschedules them from their observed churn
+    (crawls that stopped early are retried with a backoff instead), then sleeps until the next store
+    is due. Runs forever unless `max_cycles` is given."""
+    cursor = db_connection.cursor()
+    create_schedule_table_if_not_exists(cursor)
+    register_stores(cursor, store_urls, store_name_fn)
+    db_connection.commit()
+
+    total = 0
+    cycles = 0
+    while max_cycles is None or cycles < max_cycles:
+        cycles += 1
+        due_stores = pick_due_stores(cursor, store_urls, STORES_PER_CYCLE)
+        for base_url in due_stores:
+            cursor.execute("SELECT NOW();")
+            (started_at,) = cursor.fetchone()
+            db_connection.commit()
+            try:
+                products, reached_end = crawl_store(base_url)
+                total += products
+                if reached_end:
+                    record_crawl(cursor, base_url, store_name_fn(base_url), started_at)
+                else:
+                    # A partial crawl says nothing reliable about churn: retry it, don't learn from it
+                    print(f"Scheduler: crawl of {base_url} stopped before the end of its catalog.")
+                    record_failure(cursor, base_url)
+                db_connection.commit()
+            except Exception as e:
+                print(f"Scheduler: crawl of {base_url} failed: {e}")
+                try:
+                    db_connection.rollback()
+                    record_failure(cursor, base_url)
+                    db_connection.commit()
+                except mysql.connector.Error as err:
+                    print(f"Scheduler: could not reschedule {base_url}: {err}")
+        wait = seconds_until_next_due(cursor, store_urls)
+        db_connection.commit() # End the read snapshot so the next cycle sees fresh data
+        if max_cycles is not None and cycles >= max_cycles:
+            break
+        print(f"Scheduler: cycle {cycles} crawled {len(due_stores)} stores. Next check in {wait}s.")
+        time.sleep(wait)
+    cursor.close()
+    return total
@@ -0,0 +1,90 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+
+
+class ResponseArchive:
+    """Content-addressed, gzip-compressed archive of raw HTTP response bodies.
+
+    Bodies live under `<root>/objects/<2 hex>/<sha256>.gz`, so identical responses are
+    stored once. `<root>/index.jsonl` maps each fetched URL to the digest of its body;
+    the last entry for a URL wins, which is what replay serves.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.index_path = os.path.join(root, 'index.jsonl')
+        self._lock = threading.Lock()
+        self._index = None # Loaded lazily by replay
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}.gz")
+
+    def put(self, url, body, content_type=None):
+        """Archives a response body for `url` and returns its SHA-256 digest."""
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+            with open(tmp_path, 'wb') as f:
+                f.write(gzip.compress(body, compresslevel=6))
+            os.replace(tmp_path, path)
+        entry = {'url': url, 'sha256': digest, 'size': len(body),
+                 'content_type': content_type, 'fetched_at': time.time()}
+        with self._lock:
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + "\n")
+            if self._index is not None:
+                self._index[url] = entry
+        return digest
+
+    def _load_index(self):
+        with self._lock:
+            if self._index is None:
+                index = {}
+                if os.path.exists(self.index_path):
+                    with open(self.index_path, 'r', encoding='utf-8') as f:
+                        for line in f:
+                            try:
+                                entry = json.loads(line)
+                            except ValueError:
+                                continue # Tolerate a torn last line from an interrupted crawl
+                            index[entry['url']] = entry
+                self._index = index
+                print(f"Loaded response archive index: {len(index)} URLs from {self.index_path}.")
+            return self._index
+
+    def get(self, url):
+        """Returns the latest archived body for `url`, or None if it was never archived."""
+        entry = self._load_index().get(url)
+        if not entry:
+            return None
+        try:
+            with open(self._object_path(entry['sha256']), 'rb') as f:
+                return gzip.decompress(f.read())
+        except OSError as err:
+            print(f"Archived body for {url} is missing or unreadable: {err}")
+            return None
+
+    def response_for(self, url):
+        """Rebuilds a requests.Response (status 200) from the archived body of `url`, or None."""
+        body = self.get(url)
+        if body is None:
+            return None
+        entry = self._index[url]
+        response = requests.models.Response()
+        response._content = body
+        response.status_code = 200
+        response.url = url
+        response.encoding = 'utf-8'
+        if entry.get('content_type'):
+            response.headers['Content-Type'] = entry['content_type']
+        return response
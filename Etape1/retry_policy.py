@@ -0,0 +1,50 @@
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+
+def parse_retry_after(value):
+    """Parses a Retry-After header (delta-seconds or HTTP-date) into seconds, or None."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter that honours the server's Retry-After when present.
+
+    `max_delay` caps our own backoff; a Retry-After is honoured in full up to `max_retry_after`,
+    a sanity cap against broken headers (e.g. a date far in the future).
+    """
+
+    def __init__(self, max_retries=5, base_delay=1.0, max_delay=60.0, max_retry_after=900.0,
+                 retry_statuses=(429, 500, 502, 503, 504)):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.retry_statuses = frozenset(retry_statuses)
+
+    def should_retry(self, status_code, attempt):
+        """True if a failed attempt should be retried. `status_code` is None for network errors."""
+        if attempt >= self.max_retries:
+            return False
+        return status_code is None or status_code in self.retry_statuses
+
+    def delay(self, attempt, retry_after=None):
+        """Seconds to wait before retry number `attempt` (0-based)."""
+        if retry_after is not None:
+            # The server told us when to come back; add a little jitter so workers don't stampede
+            return min(self.max_retry_after, retry_after) + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
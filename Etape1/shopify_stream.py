@@ -0,0 +1,98 @@
+import json
+from typing import Any, List, Optional, Union
+
+try:
+    import msgspec # Optional: pip install msgspec
+except ImportError:
+    msgspec = None
+
+# Top-level product fields the scraper actually stores
+PRODUCT_FIELDS = ('title', 'vendor', 'body_html', 'product_type', 'handle', 'updated_at')
+# Fields kept from every variant
+VARIANT_FIELDS = ('id', 'title', 'sku', 'price', 'compare_at_price', 'available', 'option1', 'option2', 'option3')
+
+
+class ProductStreamError(ValueError):
+    """Raised when a products.json body is not valid JSON (or not shaped like one)."""
+
+
+if msgspec is not None:
+    # Typed structs: msgspec skips every field not declared here (images, options, tags...)
+    # while decoding, so the full product tree is never built. Scalars stay `Any` so odd values
+    # are handled by the scraper exactly as they would be with the json module. Fields default
+    # to UNSET, not None, so a key that is absent is told apart from one that is null, as in JSON.
+    UNSET = msgspec.UNSET
+
+    class _Variant(msgspec.Struct):
+        id: Any = UNSET
+        title: Any = UNSET
+        sku: Any = UNSET
+        price: Any = UNSET
+        compare_at_price: Any = UNSET
+        available: Any = UNSET
+        option1: Any = UNSET
+        option2: Any = UNSET
+        option3: Any = UNSET
+
+    class _Product(msgspec.Struct):
+        title: Any = UNSET
+        vendor: Any = UNSET
+        body_html: Any = UNSET
+        product_type: Any = UNSET
+        handle: Any = UNSET
+        updated_at: Any = UNSET
+        variants: Union[Optional[List[_Variant]], msgspec.UnsetType] = UNSET # Shopify sometimes sends null
+
+    class _ProductsPage(msgspec.Struct):
+        products: Union[Optional[List[_Product]], msgspec.UnsetType] = UNSET
+
+    _PAGE_DECODER = msgspec.json.Decoder(_ProductsPage)
+
+
+def _slim_product(product):
+    if not isinstance(product, dict):
+        raise ProductStreamError(f"Expected each product to be a JSON object, got {type(product).__name__}")
+    variants = product.get('variants') or []
+    if not isinstance(variants, list) or not all(isinstance(variant, dict) for variant in variants):
+        raise ProductStreamError(f"Malformed 'variants' in product {product.get('handle')!r}")
+    slim = {field: product[field] for field in PRODUCT_FIELDS if field in product}
+    slim['variants'] = [{field: variant[field] for field in VARIANT_FIELDS if field in variant} for variant in variants]
+    return slim
+
+
+def _iter_products_stdlib(body):
+    try:
+        data = json.loads(body)
+    except ValueError as err:
+        raise ProductStreamError(str(err)) from err
+    if not isinstance(data, dict):
+        raise ProductStreamError(f"Expected a JSON object, got {type(data).__name__}")
+    products = data.get('products') or []
+    if not isinstance(products, list):
+        raise ProductStreamError(f"Expected 'products' to be a list, got {type(products).__name__}")
+    for product in products:
+        yield _slim_product(product)
+
+
+def _iter_products_msgspec(body):
+    try:
+        page = _PAGE_DECODER.decode(body)
+    except msgspec.DecodeError as err:
+        raise ProductStreamError(str(err)) from err
+    for product in page.products or []:
+        slim = {field: getattr(product, field) for field in PRODUCT_FIELDS if getattr(product, field) is not UNSET}
+        slim['variants'] = [{field: getattr(variant, field) for field in VARIANT_FIELDS if getattr(variant, field) is not UNSET}
+                            for variant in product.variants or []]
+        yield slim
+
+
+def iter_products(body):
+    """Yields the products of a products.json body one at a time, keeping only the fields the
+    scraper uses (and those of every variant), shaped like Shopify's own dicts.
+
+    Decodes straight into typed structs with msgspec when it is installed, and falls back to
+    the json module otherwise. Raises ProductStreamError on malformed JSON.
+    """
+    if msgspec is not None:
+        return _iter_products_msgspec(body)
+    return _iter_products_stdlib(body)
@@ -0,0 +1,61 @@
+import json
+from collections import namedtuple
+
+from host_limits import host_of
+
+# Settings every store gets unless the registry's "defaults" or the store's own entry say otherwise
+BUILTIN_DEFAULTS = {
+    'max_concurrency': 2,     # Requests in flight against the store's host
+    'rate_per_second': 0.66,  # Token-bucket refill rate for the host
+    'burst': 2,               # Token-bucket capacity for the host
+    'page_size': 250,         # products.json ?limit= (Shopify caps it at 250)
+    'priority': 0,            # Higher priorities are crawled first
+}
+
+StoreConfig = namedtuple('StoreConfig', ['url', 'name', 'host'] + list(BUILTIN_DEFAULTS))
+
+
+def derive_store_name(base_url):
+    """Simple store name extraction, used when the registry entry has no explicit name."""
+    store_name_parts = base_url.replace("https://www.", "").replace("https://", "").split('.')
+    return store_name_parts[0] if store_name_parts else base_url
+
+
+class StoreRegistry:
+    """Stores to crawl and their per-store crawl settings, indexed by host (and by URL)."""
+
+    def __init__(self, configs):
+        self.configs = sorted(configs, key=lambda config: -config.priority) # Stable: file order within a priority
+        self.by_host = {}
+        self.by_url = {}
+        for config in self.configs:
+            self.by_url[config.url] = config
+            self.by_host.setdefault(config.host, config)
+
+    @property
+    def urls(self):
+        """Store URLs, highest priority first."""
+        return [config.url for config in self.configs]
+
+    def get(self, base_url):
+        return self.by_url.get(base_url) or self.by_host.get(host_of(base_url))
+
+    def apply_host_limits(self, host_limiter, rate_limiter):
+        """Pushes each host's concurrency and token-bucket settings into the shared limiters."""
+        for host, config in self.by_host.items():
+            host_limiter.set_host_limit(host, config.max_concurrency)
+            rate_limiter.set_host_rate(host, config.rate_per_second, config.burst)
+
+
+def load_store_registry(path):
+    """Reads a JSON registry: {"defaults": {...}, "stores": [{"url": ..., "name": ..., ...}, ...]}."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    defaults = dict(BUILTIN_DEFAULTS, **data.get('defaults', {}))
+    configs = []
+    for entry in data.get('stores', []):
+        url = entry['url'].rstrip('/')
+        settings = {key: entry.get(key, defaults[key]) for key in BUILTIN_DEFAULTS}
+        configs.append(StoreConfig(url=url, name=entry.get('name') or derive_store_name(url), host=host_of(url), **settings))
+    print(f"Loaded {len(configs)} stores from registry {path}.")
+    return StoreRegistry(configs)
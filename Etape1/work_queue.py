@@ -0,0 +1,251 @@
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+import mysql.connector
+
+# --- Work Queue Configuration ---
+LEASE_SECONDS = 300        # A claimed job is re-queued if its worker stops heartbeating for this long
+HEARTBEAT_INTERVAL = 60    # How often a worker extends the lease of the job it is running
+MAX_ATTEMPTS = 5           # Jobs claimed this many times without completing are marked 'failed'
+IDLE_POLL_SECONDS = 15     # Wait between claim attempts while other workers still hold leases
+
+
+class IncompleteJob(RuntimeError):
+    """Raised by a job handler whose work stopped before the end; run_worker releases the job for a retry."""
+
+
+_active_lease = threading.local() # The LeaseHeartbeat of the job running on this thread, if any
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def create_jobs_table_if_not_exists(cursor):
+    """Creates the crawl_jobs table shared by all workers if it doesn't already exist."""
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_jobs (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                queue_name VARCHAR(50) NOT NULL,
+                job_key VARCHAR(255) NOT NULL,
+                payload TEXT, -- JSON
+                status VARCHAR(20) NOT NULL DEFAULT 'pending', -- pending | leased | done | failed
+                lease_owner VARCHAR(100),
+                lease_token CHAR(32),
+                lease_expires_at DATETIME,
+                attempts INT NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                UNIQUE KEY uni_queue_job (queue_name, job_key),
+                INDEX idx_queue_status (queue_name, status, lease_expires_at),
+                INDEX idx_lease_token (lease_token)
+            );
+        """)
+        print("Table 'crawl_jobs' checked/created successfully.")
+    except mysql.connector.Error as err:
+        print(f"Error creating crawl_jobs table: {err}")
+
+
+class WorkQueue:
+    """A MySQL-backed job queue with row leasing, shared by worker processes on any number of machines.
+
+    Claiming is a single UPDATE ... ORDER BY id LIMIT 1, so InnoDB row locks guarantee each job
+    goes to one worker. Leases expire unless heartbeated; expired jobs become claimable again.
+    """
+
+    def __init__(self, db_connection, connect_fn, queue_name, worker_id=None,
+                 lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.db_connection = db_connection
+        self.connect_fn = connect_fn # Opens extra connections (heartbeat thread)
+        self.queue_name = queue_name
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    def enqueue(self, jobs, reset=False):
+        """Adds (job_key, payload) jobs. With `reset`, existing jobs are put back to pending (a new round)."""
+        cursor = self.db_connection.cursor()
+        if reset:
+            sql = """
+                INSERT INTO crawl_jobs (queue_name, job_key, payload) VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE payload = VALUES(payload), status = 'pending', attempts = 0,
+                    lease_owner = NULL, lease_token = NULL, lease_expires_at = NULL, last_error = NULL;
+            """
+        else:
+            sql = "INSERT IGNORE INTO crawl_jobs (queue_name, job_key, payload) VALUES (%s, %s, %s);"
+        cursor.executemany(sql, [(self.queue_name, key, json.dumps(payload)) for key, payload in jobs])
+        self.db_connection.commit()
+        cursor.close()
+        print(f"Enqueued {len(jobs)} jobs on queue '{self.queue_name}'" + (" (reset)." if reset else "."))
+
+    def requeue_expired(self):
+        """Puts jobs whose lease expired back to pending (or failed, once out of attempts)."""
+        cursor = self.db_connection.cursor()
+        cursor.execute("""
+            UPDATE crawl_jobs
+            SET status = IF(attempts >= %s, 'failed', 'pending'), lease_owner = NULL, lease_token = NULL,
+                lease_expires_at = NULL, last_error = 'lease expired'
+            WHERE queue_name = %s AND status = 'leased' AND lease_expires_at < NOW();
+        """, (self.max_attempts, self.queue_name))
+        requeued = cursor.rowcount
+        self.db_connection.commit()
+        cursor.close()
+        if requeued:
+            print(f"Re-queued {requeued} jobs with expired leases on '{self.queue_name}'.")
+        return requeued
+
+    def claim(self):
+        """Leases the next pending job. Returns (lease_token, job_key, payload) or None."""
+        self.requeue_expired()
+        token = uuid.uuid4().hex
+        cursor = self.db_connection.cursor()
+        cursor.execute("""
+            UPDATE crawl_jobs
+            SET status = 'leased', lease_owner = %s, lease_token = %s,
+                lease_expires_at = NOW() + INTERVAL %s SECOND, attempts = attempts + 1
+            WHERE queue_name = %s AND status = 'pending'
+            ORDER BY id LIMIT 1;
+        """, (self.worker_id, token, self.lease_seconds, self.queue_name))
+        claimed = cursor.rowcount
+        self.db_connection.commit()
+        if not claimed:
+            cursor.close()
+            return None
+        cursor.execute("SELECT job_key, payload FROM crawl_jobs WHERE lease_token = %s;", (token,))
+        job_key, payload = cursor.fetchone()
+        cursor.close()
+        return token, job_key, json.loads(payload) if payload else {}
+
+    def _finish(self, token, status, error=None, db_connection=None):
+        conn = db_connection or self.db_connection
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE crawl_jobs SET status = %s, last_error = %s, lease_owner = NULL, lease_token = NULL,
+                lease_expires_at = NULL
+            WHERE lease_token = %s;
+        """, (status, error, token))
+        finished = cursor.rowcount == 1
+        conn.commit()
+        cursor.close()
+        return finished
+
+    def complete(self, token):
+        """Marks a job done. Returns False if the lease was already lost (re-queued or re-claimed)."""
+        return self._finish(token, 'done')
+
+    def release(self, token, error=None):
+        """Gives a job back after a failure; it is retried until it runs out of attempts."""
+        cursor = self.db_connection.cursor()
+        cursor.execute("SELECT attempts FROM crawl_jobs WHERE lease_token = %s;", (token,))
+        row = cursor.fetchone()
+        cursor.close()
+        status = 'failed' if row and row[0] >= self.max_attempts else 'pending'
+        self._finish(token, status, error)
+
+    def heartbeat(self, token, db_connection=None):
+        """Extends a lease. Returns False if the lease was lost (expired and re-claimed elsewhere)."""
+        conn = db_connection or self.db_connection
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE crawl_jobs SET lease_expires_at = NOW() + INTERVAL %s SECOND
+            WHERE lease_token = %s AND status = 'leased';
+        """, (self.lease_seconds, token))
+        alive = cursor.rowcount == 1
+        conn.commit()
+        cursor.close()
+        return alive
+
+    def has_unfinished_jobs(self):
+        cursor = self.db_connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM crawl_jobs WHERE queue_name = %s AND status IN ('pending', 'leased');",
+                       (self.queue_name,))
+        (unfinished,) = cursor.fetchone()
+        cursor.close()
+        return unfinished > 0
+
+
+class LeaseHeartbeat:
+    """Background thread that keeps a job's lease alive while the job runs (on its own DB connection)."""
+
+    def __init__(self, work_queue, token, interval=HEARTBEAT_INTERVAL):
+        self.work_queue = work_queue
+        self.token = token
+        self.interval = interval
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="lease-heartbeat")
+
+    def _run(self):
+        conn = self.work_queue.connect_fn()
+        if not conn:
+            print("Heartbeat could not connect to MySQL; the lease will expire if the job runs long.")
+            return
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    if not self.work_queue.heartbeat(self.token, conn):
+                        print(f"Lost the lease on job {self.token}; another worker may pick it up.")
+                        self.lost.set()
+                        return
+                except mysql.connector.Error as err:
+                    print(f"Heartbeat failed: {err}")
+        finally:
+            conn.close()
+
+    def __enter__(self):
+        self._thread.start()
+        _active_lease.heartbeat = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _active_lease.heartbeat = None
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def lease_lost():
+    """True if the job running on this thread (under run_worker) has lost its lease.
+
+    Long jobs check this between units of work (pages, products) and stop early, since another
+    worker may already be running the same job. Always False outside run_worker.
+    """
+    heartbeat = getattr(_active_lease, 'heartbeat', None)
+    return heartbeat is not None and heartbeat.lost.is_set()
+
+
+def run_worker(work_queue, handle_job, wait_for_stragglers=True):
+    """Claims and runs jobs until the queue is drained. `handle_job(job_key, payload)` returns a count.
+
+    While other workers still hold leases, keeps polling so that jobs from crashed workers
+    (expired leases) are picked up. Returns the sum of the handler results.
+    """
+    print(f"Worker {work_queue.worker_id} polling queue '{work_queue.queue_name}'.")
+    total = 0
+    jobs_done = 0
+    while True:
+        job = work_queue.claim()
+        if job is None:
+            if wait_for_stragglers and work_queue.has_unfinished_jobs():
+                time.sleep(IDLE_POLL_SECONDS)
+                continue
+            break
+        token, job_key, payload = job
+        print(f"Worker {work_queue.worker_id} claimed job '{job_key}'.")
+        try:
+            with LeaseHeartbeat(work_queue, token) as heartbeat:
+                total += handle_job(job_key, payload) or 0
+            if heartbeat.lost.is_set() or not work_queue.complete(token):
+                print(f"Job '{job_key}' lost its lease while running; leaving it to the worker that holds it now.")
+                continue
+            jobs_done += 1
+        except Exception as e:
+            print(f"Job '{job_key}' failed: {e}")
+            work_queue.release(token, str(e)[:1000])
+    print(f"Worker {work_queue.worker_id} finished: {jobs_done} jobs completed.")
+    return total
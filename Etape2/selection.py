@@ -1,8 +1,15 @@
+import os
+import contextlib
 import pandas as pd
 import mysql.connector
 import numpy as np
 import re
 
+try:
+    from crawl_metrics import METRICS # Optional: lives with the scrapers (PYTHONPATH=../Etape1)
+except ImportError:
+    METRICS = None
+
 # --- Database Configurations ---
 DB_CONFIG_SHOPIFY = {
     'host': 'localhost', 'user': 'root', 'password': '', 'database': 'shopify_data'
@@ -21,6 +28,21 @@ WEIGHT_AVAILABILITY = 0.6
 WEIGHT_PRICE = 0.4
 DB_BATCH_SIZE = 500 # For saving scored_products
 
+# --- Metrics ---
+# Stage durations and row counts (analysis_stage_seconds / analysis_rows_total), written at the end
+# as Prometheus text, or JSON if the path ends in .json. Set METRICS_FILE in the environment to enable
+# (crawl_metrics.py comes from Etape1: run with PYTHONPATH=../Etape1; without it there are no metrics).
+METRICS_FILE = os.environ.get('METRICS_FILE')
+
+def stage_timer(stage):
+    """Times an analysis stage into analysis_stage_seconds (a no-op without crawl_metrics)."""
+    return METRICS.timer('analysis_stage_seconds', stage=stage) if METRICS else contextlib.nullcontext()
+
+def count_rows(amount, source, stage):
+    """Adds to analysis_rows_total (a no-op without crawl_metrics)."""
+    if METRICS:
+        METRICS.inc('analysis_rows_total', amount, source=source, stage=stage)
+
 # --- DB Connection Function (reusable) ---
 def db_connect(config, attempt_creation=False):
     db_name = config['database']
@@ -54,9 +76,17 @@ def fetch_shopify_data(conn):
     df = pd.DataFrame()
     if not conn: return df
     try:
-        query = "SELECT product_url, title, vendor, price, availability, description, category AS product_category, store_name AS source_store_name FROM products WHERE price IS NOT NULL AND title IS NOT NULL"
+        query = "SELECT product_url, title, vendor, price, availability, description_hash, category AS product_category, store_name AS source_store_name FROM products WHERE price IS NOT NULL AND title IS NOT NULL AND removed_at IS NULL"
         df = pd.read_sql(query, conn)
         if not df.empty:
+            # Shared descriptions are stored once, with their plain text extracted by the scraper;
+            # fetch each distinct one a single time (the raw HTML is not needed)
+            desc_query = "SELECT description_hash, description_text FROM product_descriptions WHERE description_hash IN (SELECT DISTINCT description_hash FROM products WHERE removed_at IS NULL)"
+            descriptions = pd.read_sql(desc_query, conn).set_index('description_hash')['description_text']
+            df['description_text'] = df['description_hash'].map(descriptions).fillna('')
+            df['description'] = None
+            df.drop(columns=['description_hash'], inplace=True)
+            print(f"Fetched {len(descriptions)} distinct descriptions for Shopify products.")
             df['source_platform'] = 'Shopify'
             df['product_tags'] = None 
             df['sku'] = None
@@ -101,7 +131,13 @@ def preprocess_combined_data(df):
     if 'availability' in df.columns:
         df.loc[:, 'is_available_numeric'] = df['availability'].apply(lambda x: 1 if isinstance(x, str) and x.lower() == 'available' else 0)
     else: df['is_available_numeric'] = 0
-    if 'description' in df.columns:
+    if 'description_text' in df.columns:
+        # Shopify text comes ready-made from the scraper; only rows without it still need HTML cleanup
+        missing_text = df['description_text'].isna()
+        if missing_text.any() and 'description' in df.columns:
+            df.loc[missing_text, 'description_text'] = df.loc[missing_text, 'description'].apply(clean_html)
+        df.loc[:, 'description_text'] = df['description_text'].fillna('')
+    elif 'description' in df.columns:
         df.loc[:, 'description_text'] = df['description'].apply(clean_html)
     else: df['description_text'] = ''
     
@@ -362,14 +398,18 @@ if __name__ == "__main__":
 
     if conn_analysis: create_analysis_tables(conn_analysis)
 
-    df_shopify_raw = fetch_shopify_data(conn_shopify)
-    df_woocommerce_raw = fetch_woocommerce_data(conn_woocommerce)
+    with stage_timer('fetch_shopify'):
+        df_shopify_raw = fetch_shopify_data(conn_shopify)
+    with stage_timer('fetch_woocommerce'):
+        df_woocommerce_raw = fetch_woocommerce_data(conn_woocommerce)
+    count_rows(len(df_shopify_raw), 'shopify', 'fetch')
+    count_rows(len(df_woocommerce_raw), 'woocommerce', 'fetch')
 
     if conn_shopify and conn_shopify.is_connected(): conn_shopify.close(); print(f"MySQL connection to {DB_CONFIG_SHOPIFY['database']} closed.")
     if conn_woocommerce and conn_woocommerce.is_connected(): conn_woocommerce.close(); print(f"MySQL connection to {DB_CONFIG_WOOCOMMERCE['database']} closed.")
 
     expected_cols = ['product_url', 'title', 'vendor', 'price', 'availability',
-                     'description', 'product_category', 'source_store_name',
+                     'description', 'description_text', 'product_category', 'source_store_name',
                      'source_platform', 'product_tags', 'sku']
     
     df_s_list = []
@@ -395,24 +435,28 @@ if __name__ == "__main__":
         print(f"\nCombined DataFrame created. Shape after dropna/duplicates: {combined_df.shape}")
 
         if not combined_df.empty:
-            combined_df = preprocess_combined_data(combined_df)
+            with stage_timer('preprocess'):
+                combined_df = preprocess_combined_data(combined_df)
             if not combined_df.empty:
-                combined_df = calculate_attractiveness_score(combined_df, WEIGHT_AVAILABILITY, WEIGHT_PRICE)
+                with stage_timer('score'):
+                    combined_df = calculate_attractiveness_score(combined_df, WEIGHT_AVAILABILITY, WEIGHT_PRICE)
                 
                 top_k_df = display_top_k_products(combined_df, TOP_K_OVERALL)
                 flagship_df_display = display_flagship_products_per_store(combined_df, FLAGSHIP_PER_STORE)
                 avg_scores, max_scores = display_store_rankings(combined_df)
 
                 if conn_analysis:
-                    save_scored_products_to_db(combined_df, conn_analysis)
-                    save_top_k_to_db(top_k_df, conn_analysis)
-                    save_flagship_to_db(flagship_df_display, conn_analysis)
-                    
-                    platform_map_df = pd.DataFrame()
-                    if not combined_df.empty and 'source_store_name' in combined_df.columns and 'source_platform' in combined_df.columns:
-                        platform_map_df = combined_df.drop_duplicates(subset=['source_store_name'])[['source_store_name', 'source_platform']].set_index('source_store_name')
-                    
-                    save_store_rankings_to_db(avg_scores, max_scores, platform_map_df, conn_analysis)
+                    with stage_timer('save'):
+                        save_scored_products_to_db(combined_df, conn_analysis)
+                        save_top_k_to_db(top_k_df, conn_analysis)
+                        save_flagship_to_db(flagship_df_display, conn_analysis)
+
+                        platform_map_df = pd.DataFrame()
+                        if not combined_df.empty and 'source_store_name' in combined_df.columns and 'source_platform' in combined_df.columns:
+                            platform_map_df = combined_df.drop_duplicates(subset=['source_store_name'])[['source_store_name', 'source_platform']].set_index('source_store_name')
+
+                        save_store_rankings_to_db(avg_scores, max_scores, platform_map_df, conn_analysis)
+                    count_rows(len(combined_df), 'combined', 'save')
             else: print("Analysis halted: Combined DataFrame empty after preprocessing.")
         else: print("Analysis halted: Combined DataFrame empty after initial combination/deduplication.")
     else: print("Analysis halted: No data fetched from any database.")
@@ -420,4 +464,8 @@ if __name__ == "__main__":
     if conn_analysis and conn_analysis.is_connected():
         conn_analysis.close()
         print(f"MySQL connection to {DB_CONFIG_ANALYSIS['database']} closed.")
+    if METRICS_FILE and METRICS:
+        METRICS.write_file(METRICS_FILE)
+    elif METRICS_FILE:
+        print("METRICS_FILE is set but crawl_metrics can't be imported (add Etape1 to PYTHONPATH). No metrics written.")
     print("\n--- Combined Analysis Complete ---")
\ No newline at end of file